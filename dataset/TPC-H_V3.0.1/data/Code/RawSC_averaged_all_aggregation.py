@@ -1,7 +1,11 @@
 import os
 import glob
 import csv
+from multiprocessing import Pool
 import numpy as np
+import columnar_store
+import estimator_state
+import resampling
 
 # === Configuration ===
 INPUT_DIR = "sample/"
@@ -10,78 +14,40 @@ PRED_LINESTATUS = "F"
 
 N = 7201871  # total population size 
 
+# RawSC runs on this many contiguous subsets of every sample
+NUM_SUBSETS = 5
 
-# === NEW: split dataset into 5 subsets ===
-def split_into_subsets(lines, num_parts=5):
-    chunk_size = len(lines) // num_parts
-    subsets = []
-    for i in range(num_parts):
-        start = i * chunk_size
-        # last chunk gets the remainder
-        end = (i + 1) * chunk_size if i < num_parts - 1 else len(lines)
-        subsets.append(lines[start:end])
-    return subsets
-
-
-# === Helper ===
-def parse_line(line):
-    parts = line.strip().split("|")
-    if len(parts) < 7:
-        return None
-    try:
-        clean_qty = float(parts[0])
-        returnflag = parts[1].strip()
-        linestatus = parts[2].strip()
-        numdup = float(parts[6])
-        return clean_qty, returnflag, linestatus, numdup
-    except ValueError:
-        return None
-
-
-# === MODIFIED: now process SAMPLE *SUBSET* instead of file ===
-def process_sample_subset(lines):
-    clean_vals = []
-    preds = []
-    numdups = []
-
-    for line in lines:
-        if not line.strip():
-            continue
-        parsed = parse_line(line)
-        if parsed is None:
-            continue
-        qty, returnflag, linestatus, numdup = parsed
-
-        pred = int(returnflag == PRED_RETURNFLAG and linestatus == PRED_LINESTATUS)
-        clean_vals.append(qty)
-        preds.append(pred)
-        numdups.append(numdup)
-
-    K = len(clean_vals)
-    if K == 0:
-        return None
-
-    clean_vals = np.array(clean_vals)
-    preds = np.array(preds)
-    numdups = np.array(numdups)
-
-    K_pred = np.sum(preds)
-    if K_pred == 0:
-        return None
-
-    # duplication correction
-    d = K / np.sum(1.0 / numdups)
-
-    # φ_clean for each aggregate
-    phi_count = preds * (N / numdups)
-    phi_sum   = preds * (N * clean_vals / numdups)
-    phi_avg   = preds * (d * K / K_pred) * (clean_vals / numdups)
-
-    return {
-        "count": np.mean(phi_count),
-        "sum": np.mean(phi_sum),
-        "avg": np.mean(phi_avg),
-    }
+# Sample files processed in parallel (1 = one after another, in this process)
+NUM_WORKERS = os.cpu_count()
+
+
+def process_sample_file(filepath):
+    """Run RawSC on NUM_SUBSETS subsets of one sample file; {agg: (mean, variance)} of the subset results."""
+    # Parse the file once into the per-row terms of the estimators
+    batch = estimator_state.batch_from_columns(
+        columnar_store.load_table(filepath), PRED_RETURNFLAG, PRED_LINESTATUS
+    )
+    terms = resampling.row_terms(batch)
+
+    # RawSC on every contiguous subset at once (batch means of the resampling engine)
+    subset_res = resampling.point_estimates(resampling.batch_sums(terms, NUM_SUBSETS), n_population=N)
+
+    # Fewer rows than NUM_SUBSETS: one subset per row (none for an empty file)
+    valid = ~np.isnan(subset_res[("rawsc", "count")])
+    for idx in np.flatnonzero(~valid):
+        print(f"Subset {idx+1}/{len(valid)} of {filepath} produced no valid result.")
+    if not valid.any():
+        print(f"⚠️ No subset of {filepath} produced a valid result — skipping the sample.")
+
+    # Average the subset results
+    result = {}
+    for agg in ["count", "sum", "avg"]:
+        subset_means = subset_res[("rawsc", agg)][valid]
+        if len(subset_means):
+            avg_est = np.mean(subset_means)
+            var_est = np.var(subset_means, ddof=1) if len(subset_means) > 1 else 0
+            result[agg] = (avg_est, var_est)
+    return result
 
 
 def main():
@@ -92,36 +58,19 @@ def main():
         print("No sample files found in", INPUT_DIR)
         return
 
-    for file in files:
-        sample_size = int(os.path.basename(file).split("_")[-1].split(".")[0])
-
-        # === NEW: Read file once ===
-        with open(file, "r", encoding="utf-8") as f:
-            lines = [line for line in f if line.strip()]
-
-        # === NEW: Split into 5 subsets ===
-        subsets = split_into_subsets(lines, num_parts=5)
-
-        subset_means = {"count": [], "sum": [], "avg": []}
+    # Process the files (in a pool when NUM_WORKERS > 1); results come back in file order
+    if NUM_WORKERS > 1 and len(files) > 1:
+        with Pool(min(NUM_WORKERS, len(files))) as pool:
+            all_res = pool.map(process_sample_file, files)
+    else:
+        all_res = [process_sample_file(file) for file in files]
 
-        # === NEW: Run RawSC on each of the 5 subsets ===
-        for idx, subset in enumerate(subsets):
-            res = process_sample_subset(subset)
-            if res is None:
-                print(f"Subset {idx+1}/5 of {file} produced no valid result.")
-                continue
-
-            for agg in ["count", "sum", "avg"]:
-                subset_means[agg].append(res[agg])
-
-        # === NEW: Average the 5 subset results ===
-        for agg in ["count", "sum", "avg"]:
-            if subset_means[agg]:
-                avg_est = np.mean(subset_means[agg])
-                var_est = np.var(subset_means[agg], ddof=1) if len(subset_means[agg]) > 1 else 0
-                results[agg].append((sample_size, avg_est, var_est))
+    for file, res in zip(files, all_res):
+        sample_size = int(os.path.basename(file).split("_")[-1].split(".")[0])
+        for agg, (avg_est, var_est) in res.items():
+            results[agg].append((sample_size, avg_est, var_est))
 
-        print(f"Processed {file} with 5-subset RawSC ✅")
+        print(f"Processed {file} with {NUM_SUBSETS}-subset RawSC ✅")
 
     # === Save CSVs ===
     for agg, data in results.items():
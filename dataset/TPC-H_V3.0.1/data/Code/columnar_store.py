@@ -0,0 +1,158 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+# === Columnar store ===
+# A store is a directory next to the .tbl file (dirty_lineitem.tbl -> dirty_lineitem.cols/)
+# holding one .npy file per column, so every column can be memory-mapped with np.load.
+
+# Column name -> dtype, in .tbl order: clean|flag|status|dirty|flag|status|numdup
+SCHEMA = {
+    "clean_qty":    "<f8",
+    "clean_return": "S1",
+    "clean_status": "S1",
+    "dirty_qty":    "<f8",
+    "dirty_return": "S1",
+    "dirty_status": "S1",
+    "numdup":       "<f8",
+}
+NUMERIC = ["clean_qty", "dirty_qty", "numdup"]
+
+PARSE_CHUNK_ROWS = 1000000
+
+
+def store_path(tbl_path):
+    """Store directory that belongs to a .tbl file."""
+    return os.path.splitext(tbl_path)[0] + ".cols"
+
+
+class ColumnAppender:
+    """
+    Append typed columns block by block as raw binary files (<column>.raw<suffix>).
+    finish_store() turns one or more of these (e.g. per-shard parts) into .npy files.
+    """
+
+    def __init__(self, store_dir, suffix=""):
+        os.makedirs(store_dir, exist_ok=True)
+        self.files = {
+            name: open(os.path.join(store_dir, f"{name}.raw{suffix}"), "wb")
+            for name in SCHEMA
+        }
+
+    def append(self, columns):
+        for name, dtype in SCHEMA.items():
+            np.ascontiguousarray(columns[name], dtype=dtype).tofile(self.files[name])
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+def finish_store(store_dir, suffixes=("",)):
+    """Concatenate the raw column parts (in the given order) into <column>.npy files."""
+    for name, dtype in SCHEMA.items():
+        dtype = np.dtype(dtype)
+        parts = [os.path.join(store_dir, f"{name}.raw{s}") for s in suffixes]
+        n = sum(os.path.getsize(p) for p in parts) // dtype.itemsize
+        with open(os.path.join(store_dir, f"{name}.npy"), "wb") as fout:
+            np.lib.format.write_array_header_1_0(fout, {
+                "descr": np.lib.format.dtype_to_descr(dtype),
+                "fortran_order": False,
+                "shape": (n,),
+            })
+            for p in parts:
+                with open(p, "rb") as fin:
+                    shutil.copyfileobj(fin, fout)
+                os.remove(p)
+
+
+def write_store(store_dir, columns):
+    """Write fully materialized columns as a store."""
+    os.makedirs(store_dir, exist_ok=True)
+    for name, dtype in SCHEMA.items():
+        np.save(os.path.join(store_dir, f"{name}.npy"), np.asarray(columns[name], dtype=dtype))
+
+
+def load_store(store_dir):
+    """Memory-map every column of a store; returns {column: array}."""
+    return {
+        name: np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode="r")
+        for name in SCHEMA
+    }
+
+
+def has_store(tbl_path):
+    """True if the .tbl file has a complete store that is at least as new as the text."""
+    store_dir = store_path(tbl_path)
+    npys = [os.path.join(store_dir, f"{name}.npy") for name in SCHEMA]
+    if not all(os.path.isfile(p) for p in npys):
+        return False
+    if not os.path.isfile(tbl_path):
+        return True
+    return min(os.path.getmtime(p) for p in npys) >= os.path.getmtime(tbl_path)
+
+
+def iter_tbl_chunks(tbl_path, chunksize=PARSE_CHUNK_ROWS):
+    """
+    Parse a clean|flag|status|dirty|flag|status|numdup file in chunks of typed columns.
+    Rows with a missing field or a non-numeric value are skipped, as in parse_line.
+    """
+    reader = pd.read_csv(
+        tbl_path, sep="|", header=None, names=list(SCHEMA), usecols=range(len(SCHEMA)),
+        dtype=str, keep_default_na=False, chunksize=chunksize,
+    )
+    for df in reader:
+        for name in NUMERIC:
+            df[name] = pd.to_numeric(df[name], errors="coerce")
+        df = df.dropna(subset=NUMERIC)
+        columns = {}
+        for name, dtype in SCHEMA.items():
+            if name in NUMERIC:
+                columns[name] = df[name].to_numpy(dtype=dtype)
+            else:
+                columns[name] = df[name].str.strip().to_numpy(dtype=object).astype(dtype)
+        yield columns
+
+
+def parse_tbl(tbl_path):
+    """Parse a whole .tbl file into typed columns (the slow path, without a store)."""
+    chunks = list(iter_tbl_chunks(tbl_path))
+    if not chunks:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in SCHEMA.items()}
+    return {name: np.concatenate([c[name] for c in chunks]) for name in SCHEMA}
+
+
+def iter_table_chunks(tbl_path, chunk_rows=PARSE_CHUNK_ROWS):
+    """Typed columns of a .tbl file in chunks: slices of its store if there is one, else parsed text."""
+    if not has_store(tbl_path):
+        yield from iter_tbl_chunks(tbl_path, chunk_rows)
+        return
+    cols = load_store(store_path(tbl_path))
+    n = len(cols["numdup"])
+    for start in range(0, n, chunk_rows):
+        yield {name: np.asarray(col[start:start + chunk_rows]) for name, col in cols.items()}
+
+
+def load_table(tbl_path):
+    """Columns of a .tbl file: memory-mapped from its store if there is one, else parsed."""
+    if has_store(tbl_path):
+        return load_store(store_path(tbl_path))
+    return parse_tbl(tbl_path)
+
+
+def convert(tbl_path):
+    """Build the store of an existing .tbl file."""
+    store_dir = store_path(tbl_path)
+    appender = ColumnAppender(store_dir)
+    for columns in iter_tbl_chunks(tbl_path):
+        appender.append(columns)
+    appender.close()
+    finish_store(store_dir)
+    return store_dir
+
+
+if __name__ == "__main__":
+    import sys
+    for path in sys.argv[1:]:
+        print(f"Converted {path} → {convert(path)}")
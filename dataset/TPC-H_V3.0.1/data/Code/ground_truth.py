@@ -0,0 +1,88 @@
+import os
+import json
+import hashlib
+
+# === Ground-truth cache ===
+# The ALL CLEAN / ALL DIRTY aggregates of a data file live in a small JSON sidecar next to it
+# (dirty_lineitem.tbl -> dirty_lineitem.truth.json), keyed by the file's SHA-256 and the predicate.
+# A file that changes gets a new hash, so stale values are never served for it.
+
+HASH_BLOCK_BYTES = 1 << 20
+
+
+def sidecar_path(data_path):
+    """Sidecar file that belongs to a data file."""
+    return os.path.splitext(data_path)[0] + ".truth.json"
+
+
+def predicate_key(predicate):
+    """Canonical string for a predicate given as a dict of attribute -> value."""
+    return json.dumps(predicate, sort_keys=True)
+
+
+def _read_sidecar(path):
+    if not os.path.isfile(path):
+        return {"sha256": None, "entries": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_sidecar(path, cache):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def file_hash(data_path, cache=None):
+    """
+    SHA-256 of a data file. The hash recorded in the sidecar is reused while the file's
+    size and mtime are unchanged, so a cache hit does not read the whole file again.
+    """
+    st = os.stat(data_path)
+    if cache and cache.get("size") == st.st_size and cache.get("mtime_ns") == st.st_mtime_ns:
+        return cache["sha256"]
+    h = hashlib.sha256()
+    with open(data_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def get(data_path, predicate, compute=None, refresh=False):
+    """
+    Cached {"clean": {...}, "dirty": {...}} aggregates of data_path under predicate.
+    On a miss (or with refresh=True) compute(data_path) is run and its result stored in the sidecar.
+    If the data file itself is gone, the values last stored for it are returned.
+    """
+    path = sidecar_path(data_path)
+    cache = _read_sidecar(path)
+    key = predicate_key(predicate)
+
+    if not os.path.isfile(data_path):
+        if key in cache["entries"]:
+            return cache["entries"][key]
+        raise FileNotFoundError(
+            f"{data_path} not found and {path} has no ground truth for predicate {key}"
+        )
+
+    digest = file_hash(data_path, cache)
+    st = os.stat(data_path)
+    if not refresh and digest == cache["sha256"] and key in cache["entries"]:
+        if (cache.get("size"), cache.get("mtime_ns")) != (st.st_size, st.st_mtime_ns):
+            cache.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+            _write_sidecar(path, cache)
+        return cache["entries"][key]
+    if compute is None:
+        raise KeyError(f"No ground truth for {data_path} under predicate {key}")
+
+    result = compute(data_path)
+    if result is None:
+        raise ValueError(f"No ground truth could be computed for {data_path} under predicate {key}")
+
+    if digest != cache["sha256"]:
+        cache = {"sha256": digest, "entries": {}}
+    cache.update(file=os.path.basename(data_path), size=st.st_size, mtime_ns=st.st_mtime_ns)
+    cache["entries"][key] = result
+    _write_sidecar(path, cache)
+    return result
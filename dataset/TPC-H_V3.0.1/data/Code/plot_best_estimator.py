@@ -1,14 +1,15 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+import all_infos
 
 # ----------------------------
 # CONFIG
 # ----------------------------
 ALL_RESULTS = {
-    "avg":  {"ALL_DIRTY": 31.97,   "ALL_CLEAN": 25.52,    "Y_LABEL": "AVG"},
-    "sum":  {"ALL_DIRTY": 52950112, "ALL_CLEAN": 37734107, "Y_LABEL": "SUM"},
-    "count":{"ALL_DIRTY": 1656658, "ALL_CLEAN": 1478493,  "Y_LABEL": "COUNT"},
+    "avg":  {"Y_LABEL": "AVG"},
+    "sum":  {"Y_LABEL": "SUM"},
+    "count":{"Y_LABEL": "COUNT"},
 }
 
 Z = 1.96   # 95% CI
@@ -99,6 +100,7 @@ def plot_best_estimator(agg_name):
 
 
 def main():
+    all_infos.fill_results(ALL_RESULTS)
     for agg in ["avg", "count", "sum"]:
         plot_best_estimator(agg)
 
@@ -1,14 +1,15 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+import all_infos
 
 Z = 1.96  # 95% CI
 
 # === CONFIGURATION ===
 ALL_RESULTS = {
-    "avg":  {"ALL_DIRTY": 31.97,    "ALL_CLEAN": 25.52,    "LABEL": "AVG"},
-    "sum":  {"ALL_DIRTY": 52950112, "ALL_CLEAN": 37734107, "LABEL": "SUM"},
-    "count":{"ALL_DIRTY": 1656658,  "ALL_CLEAN": 1478493,  "LABEL": "COUNT"},
+    "avg":  {"LABEL": "AVG"},
+    "sum":  {"LABEL": "SUM"},
+    "count":{"LABEL": "COUNT"},
 }
 
 def plot_ci_percentage_error(agg_name):
@@ -72,6 +73,7 @@ def plot_ci_percentage_error(agg_name):
     print(f"✅ Saved graphs/ci_error_{agg_name}.png and PDF")
 
 def main():
+    all_infos.fill_results(ALL_RESULTS)
     for agg in ["avg", "count", "sum"]:
         plot_ci_percentage_error(agg)
 
@@ -2,12 +2,13 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+import all_infos
 
 # === CONFIGURATION ===
 ALL_RESULTS = {
-    "count": {"ALL_DIRTY": 1656658, "ALL_CLEAN": 1478493, "Y_LABEL": "COUNT"},
-    "sum":   {"ALL_DIRTY": 52950112, "ALL_CLEAN": 37734107, "Y_LABEL": "SUM"},
-    "avg":   {"ALL_DIRTY": 31.97, "ALL_CLEAN": 25.52, "Y_LABEL": "AVG"},
+    "count": {"Y_LABEL": "COUNT"},
+    "sum":   {"Y_LABEL": "SUM"},
+    "avg":   {"Y_LABEL": "AVG"},
 }
 
 os.makedirs("graphs", exist_ok=True)
@@ -67,6 +68,7 @@ def plot_normalizedsc_result(agg_name):
 
 
 def main():
+    all_infos.fill_results(ALL_RESULTS)
     for agg in ["count", "sum", "avg"]:
         try:
             plot_normalizedsc_result(agg)
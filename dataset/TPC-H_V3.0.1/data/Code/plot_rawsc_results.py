@@ -1,13 +1,13 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import all_infos
 
 # === CONFIGURATION ===
-# Replace these with the actual results from your ALL CLEAN / ALL DIRTY run
 ALL_RESULTS = {
-    "count": {"ALL_DIRTY": 1656658, "ALL_CLEAN": 1478493, "Y_LABEL": "COUNT"},
-    "sum":   {"ALL_DIRTY": 52950112, "ALL_CLEAN": 37734107, "Y_LABEL": "SUM"},
-    "avg":   {"ALL_DIRTY": 31.97, "ALL_CLEAN": 25.52, "Y_LABEL": "AVG"},
+    "count": {"Y_LABEL": "COUNT"},
+    "sum":   {"Y_LABEL": "SUM"},
+    "avg":   {"Y_LABEL": "AVG"},
 }
 
 # Default total number of elements (only used for axis scaling if needed)
@@ -59,6 +59,7 @@ def plot_rawsc_result(agg_name):
 
 
 def main():
+    all_infos.fill_results(ALL_RESULTS)
     for agg in ["count", "sum", "avg"]:
         try:
             plot_rawsc_result(agg)
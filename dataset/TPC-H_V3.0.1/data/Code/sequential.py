@@ -0,0 +1,133 @@
+import csv
+import numpy as np
+import columnar_store
+import estimator_state
+import monte_carlo
+import all_infos
+
+# === Sequential sampling ===
+# Instead of cleaning fixed sample sizes and judging afterwards which one was enough,
+# clean the population in batches and stop as soon as the CI of the chosen estimator is
+# narrow enough for every requested aggregate (by default its half-width, Z * standard
+# error, is within TARGET_CI_PCT of the estimate). Every row gets an entry size
+# u * TOT_DIRTY_LINES / numdup (u uniform): the rows with entry size below S are exactly a
+# sample of size S under the generator's rule, so cleaning rows in entry order walks
+# through nested samples of growing size. Cleaning a row reveals its clean values, and
+# the estimates are updated incrementally through an EstimatorState.
+
+# === Configuration ===
+INPUT_FILE = all_infos.INPUT_FILE
+OUTPUT_CSV = "sequential_results.csv"
+
+ESTIMATOR = "normalizedsc"           # "rawsc" or "normalizedsc"
+AGGREGATES = ["count", "sum", "avg"]
+TARGET_CI_PCT = 5.0                  # stop when the CI (half-)width <= this % of the estimate
+# "half": Z * standard error, the ± margin of the estimate; "full": high - low, as plot_error
+WIDTH = "half"
+
+BATCH_ROWS = 250                     # rows cleaned between two checks
+MIN_ROWS = 500                       # never stop before this many cleaned rows
+MAX_SAMPLE_SIZE = 10000              # cleaning budget, in sample-size units (largest fixed sample)
+SEED = None                          # None draws a fresh one (printed so the run can be repeated)
+
+
+class SequentialSampler:
+    """Hands out the rows of the population in entry order, a batch at a time."""
+
+    def __init__(self, numdup, rng, max_sample_size=MAX_SAMPLE_SIZE):
+        entry = rng.random(len(numdup)) * all_infos.TOT_DIRTY_LINES / numdup
+        rows = np.flatnonzero(entry < max_sample_size)
+        order = np.argsort(entry[rows], kind="stable")
+        self.rows = rows[order]
+        self.entry = entry[self.rows]
+        self.pos = 0
+
+    def next_batch(self, size):
+        """Row numbers of the next size rows to clean (fewer at the end of the budget)."""
+        rows = self.rows[self.pos:self.pos + size]
+        self.pos += len(rows)
+        return rows
+
+    @property
+    def sample_size(self):
+        """Sample size (S) whose sample is exactly the rows handed out so far."""
+        return float(self.entry[self.pos - 1]) if self.pos else 0.0
+
+
+def clean_rows(cols, rows):
+    """Clean the given rows of the dirty file: their clean and dirty values as an estimator batch."""
+    return estimator_state.batch_from_columns({name: np.asarray(col[rows]) for name, col in cols.items()})
+
+
+def ci_pct(state, all_dirty, estimator=ESTIMATOR, aggregates=AGGREGATES, width=WIDTH):
+    """
+    {agg: (estimate, CI half-width or full width (see WIDTH) as % of the estimate)},
+    or None while the estimator is undefined.
+    """
+    if width not in ("half", "full"):
+        raise ValueError(f"Unknown CI width: {width}")
+    ci = state.confidence_intervals(all_dirty)
+    if any((estimator, agg) not in ci for agg in aggregates):
+        return None
+    out = {}
+    for agg in aggregates:
+        est, low, high = ci[(estimator, agg)]
+        span = high - est if width == "half" else high - low
+        out[agg] = (est, span / abs(est) * 100 if est else np.inf)
+    return out
+
+
+def run(path=INPUT_FILE, estimator=ESTIMATOR, aggregates=AGGREGATES, target_pct=TARGET_CI_PCT,
+        batch_rows=BATCH_ROWS, min_rows=MIN_ROWS, max_sample_size=MAX_SAMPLE_SIZE, seed=SEED,
+        width=WIDTH):
+    """
+    Clean batches until every aggregate's CI (half-)width is within target_pct of its
+    estimate (or the budget is used up).
+    Returns (trajectory rows, final state, whether the target was met).
+    """
+    seed_seq = np.random.SeedSequence(seed)
+    print(f"Seed: {seed_seq.entropy}")
+    rng = np.random.default_rng(seed_seq)
+
+    all_dirty = all_infos.true_values(path)["dirty"]
+    cols = columnar_store.load_table(path)
+    sampler = SequentialSampler(np.asarray(cols["numdup"], dtype=np.float64), rng, max_sample_size)
+    state = estimator_state.EstimatorState(monte_carlo.N)
+
+    trajectory = []
+    while True:
+        rows = sampler.next_batch(batch_rows)
+        if len(rows) == 0:
+            print(f"Budget of sample size {max_sample_size} used up before reaching {target_pct}%.")
+            return trajectory, state, False
+        state.update(clean_rows(cols, rows))
+
+        res = ci_pct(state, all_dirty, estimator, aggregates, width)
+        if res is None:
+            continue
+        for agg, (est, pct) in res.items():
+            trajectory.append({
+                "rows_cleaned": state.K, "sample_size": sampler.sample_size,
+                "estimator": estimator, "aggregate": agg, "estimate": est, "width": width, "ci_pct": pct,
+            })
+        worst = max(pct for _, pct in res.values())
+        print(f"{state.K:>6} rows (S≈{sampler.sample_size:.0f}): widest CI {width} width {worst:.2f}% of the estimate")
+        if state.K >= min_rows and worst <= target_pct:
+            print(f"Target of {target_pct}% reached after {state.K} cleaned rows "
+                  f"({sampler.sample_size / max_sample_size:.1%} of the budget).")
+            return trajectory, state, True
+
+
+def main():
+    trajectory, _, _ = run()
+    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=[
+            "rows_cleaned", "sample_size", "estimator", "aggregate", "estimate", "width", "ci_pct",
+        ])
+        writer.writeheader()
+        writer.writerows(trajectory)
+    print(f"Saved trajectory → {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
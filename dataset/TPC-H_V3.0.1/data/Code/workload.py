@@ -0,0 +1,236 @@
+import os
+import glob
+import csv
+import json
+import numpy as np
+import columnar_store
+import estimator_state
+import ground_truth
+import all_infos
+
+# === Query workload ===
+# Answers a list of aggregate queries over every sample with one parsed copy of each file.
+# A query is {"id", "aggregate", "attribute", "predicate"}; the predicate maps attributes
+# to a value (equality) or [op, value] with op in OPS ("in" takes a list). Predicates are
+# compiled to vectorized masks on the clean and dirty columns, queries sharing attribute
+# and predicate share one EstimatorState, and results are keyed by query id.
+
+# === Configuration ===
+INPUT_DIR = "sample/"
+SAMPLE_PATTERN = "sample_lineitem_*.tbl"
+DIRTY_FILE = all_infos.INPUT_FILE
+OUTPUT_CSV = "workload_results.csv"
+
+# JSON file with a list of queries; None uses QUERIES below
+WORKLOAD_FILE = None
+
+QUERIES = [
+    {"id": "count_AF", "aggregate": "count", "attribute": "quantity",
+     "predicate": {"returnflag": "A", "linestatus": "F"}},
+    {"id": "sum_AF", "aggregate": "sum", "attribute": "quantity",
+     "predicate": {"returnflag": "A", "linestatus": "F"}},
+    {"id": "avg_AF", "aggregate": "avg", "attribute": "quantity",
+     "predicate": {"returnflag": "A", "linestatus": "F"}},
+    {"id": "avg_R", "aggregate": "avg", "attribute": "quantity",
+     "predicate": {"returnflag": "R"}},
+    {"id": "count_small_O", "aggregate": "count", "attribute": "quantity",
+     "predicate": {"quantity": ["<=", 10], "linestatus": "O"}},
+]
+
+# Attribute -> (clean column, dirty column) in the columnar store
+ATTRIBUTES = {
+    "quantity": ("clean_qty", "dirty_qty"),
+    "returnflag": ("clean_return", "dirty_return"),
+    "linestatus": ("clean_status", "dirty_status"),
+}
+
+OPS = {
+    "==": np.equal, "!=": np.not_equal,
+    "<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+}
+
+
+def load_workload(path=WORKLOAD_FILE):
+    """Queries from a JSON file, or QUERIES when path is None; ids must be unique."""
+    if path is None:
+        queries = QUERIES
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            queries = json.load(f)
+    ids = [q["id"] for q in queries]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Query ids in the workload are not unique")
+    for q in queries:
+        if q["aggregate"] not in estimator_state.AGGREGATES:
+            raise ValueError(f"Query {q['id']}: unknown aggregate {q['aggregate']!r}")
+        for attr in [q["attribute"], *q["predicate"]]:
+            if attr not in ATTRIBUTES:
+                raise ValueError(f"Query {q['id']}: unknown attribute {attr!r}")
+    return queries
+
+
+def _operand(column, value):
+    """value in the dtype of column (bytes for the flag columns)."""
+    if column.dtype.kind == "S":
+        return np.array([v.encode() for v in value]) if isinstance(value, list) else value.encode()
+    return value
+
+
+def compile_predicate(predicate):
+    """Turn a predicate dict into mask(cols, side) with side 0 = clean, 1 = dirty columns."""
+    terms = []
+    for attr, cond in predicate.items():
+        op, value = cond if isinstance(cond, list) else ("==", cond)
+        if op != "in" and op not in OPS:
+            raise ValueError(f"Unknown predicate operator {op!r}")
+        terms.append((ATTRIBUTES[attr], op, value))
+
+    def mask(cols, side):
+        out = np.ones(len(cols["numdup"]), dtype=bool)
+        for columns, op, value in terms:
+            column = cols[columns[side]]
+            operand = _operand(column, value)
+            out &= np.isin(column, operand) if op == "in" else OPS[op](column, operand)
+        return out
+
+    return mask
+
+
+def group_key(query):
+    """Queries with the same attribute and predicate share their sufficient statistics."""
+    return json.dumps([query["attribute"], query["predicate"]], sort_keys=True)
+
+
+def query_batches(cols, queries):
+    """{group key: estimator batch} for the distinct (attribute, predicate) pairs of the workload."""
+    batches = {}
+    numdup = np.asarray(cols["numdup"], dtype=np.float64)
+    for q in queries:
+        key = group_key(q)
+        if key in batches:
+            continue
+        mask = compile_predicate(q["predicate"])
+        clean_col, dirty_col = ATTRIBUTES[q["attribute"]]
+        batches[key] = {
+            "pred_clean": mask(cols, 0),
+            "pred_dirty": mask(cols, 1),
+            "clean": np.asarray(cols[clean_col], dtype=np.float64),
+            "dirty": np.asarray(cols[dirty_col], dtype=np.float64),
+            "numdup": numdup,
+        }
+    return batches
+
+
+def compute_true_values(queries, path=DIRTY_FILE):
+    """ALL CLEAN / ALL DIRTY of every query in one scan of the dirty file (weights as in all_infos)."""
+    keys = sorted({group_key(q) for q in queries})
+    masks = {key: compile_predicate(json.loads(key)[1]) for key in keys}
+    attrs = {key: ATTRIBUTES[json.loads(key)[0]] for key in keys}
+    clean = {key: all_infos.StreamingAggregate() for key in keys}
+    dirty = {key: all_infos.StreamingAggregate() for key in keys}
+
+    for cols in columnar_store.iter_table_chunks(path, all_infos.CHUNK_ROWS):
+        for key in keys:
+            clean_match = masks[key](cols, 0)
+            dirty_match = masks[key](cols, 1)
+            clean[key].update(cols[attrs[key][0]][clean_match], np.ones(int(clean_match.sum())))
+            dirty[key].update(cols[attrs[key][1]][dirty_match], cols["numdup"][dirty_match])
+
+    out = {}
+    for key in keys:
+        if clean[key].count == 0 or dirty[key].count == 0:
+            continue
+        out[key] = {
+            side: {"count": agg.count, "sum": agg.sum, "avg": agg.avg}
+            for side, agg in (("clean", clean[key]), ("dirty", dirty[key]))
+        }
+    return out
+
+
+def true_values(queries, path=DIRTY_FILE, refresh=False):
+    """
+    {group key: ALL CLEAN / ALL DIRTY} of the workload, from the ground-truth sidecar of path.
+    Every group missing there is computed in one shared scan and stored.
+    """
+    truths = {}
+    missing = []
+    for key in sorted({group_key(q) for q in queries}):
+        predicate = {"workload": json.loads(key)}
+        try:
+            if refresh:
+                raise KeyError(key)
+            truths[key] = ground_truth.get(path, predicate)
+        except KeyError:
+            missing.append(key)
+    if missing:
+        computed = compute_true_values([q for q in queries if group_key(q) in missing], path)
+        for key in missing:
+            if key not in computed:
+                print(f"No matching rows for workload group {key}.")
+                continue
+            predicate = {"workload": json.loads(key)}
+            truths[key] = ground_truth.get(path, predicate, lambda _: computed[key], refresh=True)
+    return truths
+
+
+def evaluate(cols, queries, truths=None):
+    """
+    RawSC and NormalizedSC of every query on one parsed sample.
+    Returns {query id: {"K": rows, "rawsc": (est, var) or None, "normalizedsc": (est, var) or None}}.
+    """
+    states = {
+        key: estimator_state.EstimatorState.from_batch(batch)
+        for key, batch in query_batches(cols, queries).items()
+    }
+    out = {}
+    for q in queries:
+        key = group_key(q)
+        state = states[key]
+        raw = state.rawsc()
+        norm = None
+        if truths is not None and key in truths:
+            norm = state.normalizedsc(truths[key]["dirty"])
+        out[q["id"]] = {
+            "K": state.K,
+            "rawsc": raw[q["aggregate"]] if raw else None,
+            "normalizedsc": norm[q["aggregate"]] if norm else None,
+        }
+    return out
+
+
+def main():
+    queries = load_workload()
+    truths = true_values(queries)
+
+    files = sorted(glob.glob(os.path.join(INPUT_DIR, SAMPLE_PATTERN)))
+    if not files:
+        print("No sample files found in", INPUT_DIR)
+        return
+
+    rows = []
+    for file in files:
+        sample_size = int(os.path.basename(file).split("_")[-1].split(".")[0])
+        res = evaluate(columnar_store.load_table(file), queries, truths)
+        for q in queries:
+            for estimator in ["rawsc", "normalizedsc"]:
+                if res[q["id"]][estimator] is None:
+                    continue
+                est, var = res[q["id"]][estimator]
+                half = estimator_state.Z * np.sqrt(var / sample_size)
+                rows.append({
+                    "query_id": q["id"], "sample_size": sample_size, "estimator": estimator,
+                    "estimate": est, "variance": var, "ci_low": est - half, "ci_high": est + half,
+                })
+        print(f"Processed {file} ({len(queries)} queries) ✅")
+
+    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=[
+            "query_id", "sample_size", "estimator", "estimate", "variance", "ci_low", "ci_high",
+        ])
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Saved results → {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
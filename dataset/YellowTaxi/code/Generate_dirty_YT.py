@@ -1,5 +1,10 @@
-import random
 import os
+import shutil
+from multiprocessing import Pool
+import numpy as np
+import columnar_store
+import stratified
+import all_infos
 
 # === Config ===
 INPUT_FILE = "ytd_2024-11_12.tbl"
@@ -31,11 +36,11 @@ TOTAL_IDX = 4     # total_amount is the quantity-like attribute
 # Error probabilities
 VAL_ERR_PROB = 0.30   # OCR value confusion on total_amount
 COND_ERR_PROB = 0.10  # passenger_count modification
-DUP_ERR_PROB = 0.20   # duplication
+DUP_ERR_PROB = all_infos.DUP_ERR_PROB  # 20% chance for duplication
 
-# Approx dataset size (adjust if known)
-TOT_LINE_NUMBER = 6614775
-TOT_DIRTY_LINES = TOT_LINE_NUMBER * (1 + DUP_ERR_PROB)
+# Approx dataset size (adjust if known, in all_infos)
+TOT_LINE_NUMBER = all_infos.TOT_LINE_NUMBER
+TOT_DIRTY_LINES = all_infos.TOT_DIRTY_LINES
 
 '''
 Total lines processed: 6614775
@@ -46,78 +51,318 @@ Output samples written to: sample/
 
 # Sampling settings
 SAMPLE_SIZES = list(range(500, 10001, 500))
+BLOCK_BYTES = 64 * 1024 * 1024   # input read per block (cut at a line boundary)
 
-def ocr_confuse(value: str) -> str:
-    result = []
-    for ch in value:
-        if ch in OCR_CONFUSION:
-            result.append(random.choice(OCR_CONFUSION[ch]))
-        else:
-            result.append(ch)
-    return ''.join(result)
+# Reproducibility / parallelism
+SEED = None           # master seed; None draws a fresh one (printed so the run can be repeated)
+NUM_SHARDS = 1        # output is bit-identical for a given (SEED, NUM_SHARDS)
+NUM_WORKERS = os.cpu_count()
 
-def main():
-    total_lines = 0
-    dirty_value_changes = 0
-    duplicate_count = 0
+# Sample membership: "hash" takes each row's uniform from a seeded hash of its byte offset
+# in INPUT_FILE, so it depends only on (SEED, row) and not on NUM_SHARDS or on the order
+# of the RNG draws (membership still scales with the row's numdup); "rng" draws it from
+# the shard's RNG stream
+SAMPLING = "hash"
 
-    sample_files = {}
-    for N in SAMPLE_SIZES:
-        fname = os.path.join(OUTPUT_DIR, f"sample_ytd_{N}.tbl")
-        sample_files[N] = open(fname, "w")
-    
-    all_dirty_file = open(ALLDIRTY_FILE, "w")
+# Also write a memory-mappable columnar store (<name>.cols/) next to every .tbl output
+WRITE_COLUMNAR = True
+
+# Also draw Neyman-allocated stratified samples from ALLDIRTY_FILE (see stratified.py)
+STRATIFIED = False
+
+
+def build_ocr_table():
+    """
+    Byte lookup table for OCR confusion.
+    Byte b is replaced by table[b, k] with k uniform in [0, counts[b]);
+    non-digit bytes (and the NUL padding of fixed-width arrays) map to themselves.
+    """
+    width = max(len(c) for c in OCR_CONFUSION.values())
+    table = np.repeat(np.arange(256, dtype=np.uint8)[:, None], width, axis=1)
+    counts = np.ones(256, dtype=np.int64)
+    for digit, choices in OCR_CONFUSION.items():
+        table[ord(digit), :len(choices)] = [ord(c) for c in choices]
+        counts[ord(digit)] = len(choices)
+    return table, counts
+
+OCR_TABLE, OCR_COUNTS = build_ocr_table()
+
+def ocr_confuse(values, rng):
+    """Apply OCR-like digit confusion to an array of numeric byte strings."""
+    codes = values.view(np.uint8).reshape(len(values), values.itemsize)
+    pick = (rng.random(codes.shape) * OCR_COUNTS[codes]).astype(np.intp)
+    return np.ascontiguousarray(OCR_TABLE[codes, pick]).view(values.dtype).ravel()
+
+def shard_bounds(path, num_shards):
+    """Split the file into num_shards byte ranges that start and end on line boundaries."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as f:
+        for k in range(1, num_shards):
+            pos = max(size * k // num_shards, bounds[-1])
+            if pos > 0:
+                # finish the line that contains byte pos - 1
+                f.seek(pos - 1)
+                f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def iter_blocks(path, start=0, end=None, block_bytes=BLOCK_BYTES):
+    """
+    Yield bytes [start, end) of the file in blocks that end on the last line boundary
+    before start + k * block_bytes (a last line without newline comes as its own block).
+    Blocks are zero-copy memoryviews; the partial line after a cut is read again with
+    the next block instead of being concatenated to it.
+    """
+    if end is None:
+        end = os.path.getsize(path)
+    with open(path, "rb") as f:
+        pos = limit = start
+        while limit < end:
+            limit = min(limit + block_bytes, end)
+            f.seek(pos)
+            data = f.read(limit - pos)
+            if not data:
+                break
+            cut = data.rfind(b"\n") + 1
+            view = memoryview(data)
+            if cut:
+                yield view[:cut]
+                pos += cut
+            if limit == end and cut < len(data):
+                yield view[cut:]
+
+def row_bounds(buf):
+    """Start and end (newline or end of block) offsets of the non-empty rows of a block."""
+    ends = np.flatnonzero(buf == ord("\n"))
+    if len(buf) and buf[-1] != ord("\n"):
+        ends = np.append(ends, len(buf))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+def read_block(block):
+    """
+    Cut the needed columns out of a block of taxi rows, as fixed-width byte arrays,
+    and return them with the offset of every row in the block.
+    Works directly on the raw bytes: every row has the same number of '|' separators,
+    so the separator positions reshape into a (rows, fields) matrix of offsets.
+    """
+    buf = np.frombuffer(block, dtype=np.uint8)
+    starts, ends = row_bounds(buf)
+    n = len(starts)
+    if n == 0:
+        return tuple(np.empty(0, dtype="S1") for _ in range(2)), starts
+    pipes = np.flatnonzero(buf == ord("|"))
+    if len(pipes) % n != 0:
+        raise ValueError("Rows with a varying number of fields in block")
+    pipes = pipes.reshape(n, -1)
+    # row i owns pipes[i] iff every row has the same count (a shift shows at some row edge)
+    if pipes.shape[1] and (np.any(pipes[:, 0] < starts) or np.any(pipes[:, -1] >= ends)):
+        raise ValueError("Rows with a varying number of fields in block")
+    # field idx ends at pipe idx, the last field (no trailing pipe) at the row end
+    sep = lambda idx: pipes[:, idx] if idx < pipes.shape[1] else ends
+    columns = []
+    for idx in (TOTAL_IDX, PASSENGER_IDX):
+        begin = starts if idx == 0 else sep(idx - 1) + 1
+        columns.append(field_bytes(buf, begin, sep(idx)))
+    return tuple(columns), starts
+
+def field_bytes(buf, begin, end):
+    """Gather buf[begin:end] for every row into one NUL-padded fixed-width byte array."""
+    width = max(int((end - begin).max()), 1)
+    pos = begin[:, None] + np.arange(width)
+    out = buf[np.minimum(pos, len(buf) - 1)]
+    out[pos >= end[:, None]] = 0
+    return out.view(f"S{width}").ravel()
+
+def join_columns(columns):
+    """
+    Lay out byte-string columns as '|'-separated lines in one uint8 matrix.
+    Each row still carries the NUL padding of its columns; strip it with `row[row != 0]`.
+    """
+    n = len(columns[0])
+    pipe = np.full((n, 1), ord("|"), dtype=np.uint8)
+    parts = []
+    for col in columns:
+        parts.append(np.ascontiguousarray(col).view(np.uint8).reshape(n, col.itemsize))
+        parts.append(pipe)
+    parts[-1] = np.full((n, 1), ord("\n"), dtype=np.uint8)
+    return np.concatenate(parts, axis=1)
+
+def hash_uniform(row_ids, key):
+    """Uniform [0, 1) value per row ID (uint64), fixed by (key, row ID) alone (SplitMix64)."""
+    with np.errstate(over="ignore"):
+        x = row_ids ^ np.uint64(key)
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+def sample_start_index(num_dups, u):
+    """
+    Decide membership in every sample size from one uniform value u per row.
+
+    A row joins sample N iff u < (N * num_dup) / TOT_DIRTY_LINES, so each sample
+    keeps its inclusion probability and smaller samples are nested in larger ones.
+    Returns, per row, the index of the smallest sample size it belongs to
+    (len(SAMPLE_SIZES) if it belongs to none).
+    """
+    return np.searchsorted(SAMPLE_SIZES, u * TOT_DIRTY_LINES / num_dups, side="right")
+
+def to_float(values):
+    """Parse an array of numeric byte strings; empty fields become NaN."""
+    return np.where(values == b"", b"nan", values).astype(np.float64)
+
+def dirty_floats(clean_values, clean, dirty):
+    """Floats of a dirty column: only the values that differ from the clean one are parsed."""
+    values = clean_values.copy()
+    changed = dirty != clean
+    values[changed] = to_float(dirty[changed])
+    return values
+
+def corrupt_block(clean_total, clean_passenger, rng):
+    """Draw all error masks for a block at once and return the dirty columns."""
+    n = len(clean_total)
 
-    with open(INPUT_FILE, "r", encoding="utf-8") as fin:
-        for line in fin:
-            if not line.strip():
+    # Apply OCR confusion to total_amount
+    val_err = rng.random(n) < VAL_ERR_PROB
+    dirty_total = clean_total.copy()
+    dirty_total[val_err] = ocr_confuse(clean_total[val_err], rng)
+
+    # Apply passenger_count condition rule
+    cond_err = rng.random(n) < COND_ERR_PROB
+    p = to_float(clean_passenger)
+    dirty_passenger = np.where(cond_err, np.where(p == 1, b"2", b"1"), clean_passenger)
+
+    # Duplication error
+    dup_err = rng.random(n) < DUP_ERR_PROB
+    num_dup = np.where(dup_err, 2, 1)
+
+    dirty_flag = (dirty_total != clean_total) | cond_err
+    return dirty_total, dirty_passenger, num_dup, dirty_flag
+
+def process_shard(task):
+    """Corrupt and sample one byte range of the input with its own RNG stream."""
+    start, end, seed_seq, hash_key, part_suffix = task
+    rng = np.random.default_rng(seed_seq)
+    counts = {"total_lines": 0, "dirty_value_changes": 0, "duplicate_count": 0}
+    sample_rows = {N: [] for N in SAMPLE_SIZES}
+
+    appender = None
+    if WRITE_COLUMNAR:
+        appender = columnar_store.ColumnAppender(
+            columnar_store.store_path(ALLDIRTY_FILE), suffix=part_suffix
+        )
+
+    with open(ALLDIRTY_FILE + part_suffix, "wb") as part_file:
+        pos = start
+        for block in iter_blocks(INPUT_FILE, start, end):
+            block_start = pos
+            pos += len(block)
+            (clean_total, clean_passenger), row_starts = read_block(block)
+            if len(clean_total) == 0:
                 continue
-            total_lines += 1
-            fields = line.strip().split('|')
-
-            clean_total = fields[TOTAL_IDX]
-            clean_passenger = fields[PASSENGER_IDX]
-
-            dirty_total = clean_total
-            dirty_passenger = clean_passenger
-            num_dup = 1
-            dirty_flag = False
-
-            # Apply OCR confusion to total_amount
-            if random.random() < VAL_ERR_PROB:
-                dirty_total = ocr_confuse(clean_total)
-                if dirty_total != clean_total:
-                    dirty_flag = True
-
-            # Apply passenger_count condition rule
-            if random.random() < COND_ERR_PROB:
-                p = float(clean_passenger)
-                if p == 1:
-                    dirty_passenger = "2"
-                else:
-                    dirty_passenger = "1"
-                dirty_flag = True
-
-            # Duplication error
-            if random.random() < DUP_ERR_PROB:
-                num_dup = 2
-                duplicate_count += 1
-
-            if dirty_flag:
-                dirty_value_changes += 1
-
-            out_line = f"{clean_total}|{clean_passenger}|{dirty_total}|{dirty_passenger}|{num_dup}\n"
+            dirty_total, dirty_passenger, num_dup, dirty_flag = corrupt_block(
+                clean_total, clean_passenger, rng
+            )
+
+            counts["total_lines"] += len(clean_total)
+            counts["dirty_value_changes"] += int(dirty_flag.sum())
+            counts["duplicate_count"] += int((num_dup == 2).sum())
+
+            lines = join_columns([
+                clean_total, clean_passenger,
+                dirty_total, dirty_passenger,
+                np.where(num_dup == 2, b"2", b"1"),
+            ])
 
             # Sampling
-            for N in SAMPLE_SIZES:
-                prob = (N * num_dup) / TOT_DIRTY_LINES
-                if random.random() < prob:
-                    sample_files[N].write(out_line)
+            if SAMPLING == "hash":
+                u = hash_uniform(np.uint64(block_start) + row_starts.astype(np.uint64), hash_key)
+            else:
+                u = rng.random(len(num_dup))
+            start_idx = sample_start_index(num_dup, u)
+            for i in np.flatnonzero(start_idx < len(SAMPLE_SIZES)):
+                row = lines[i]
+                out_line = row[row != 0].tobytes()
+                for N in SAMPLE_SIZES[start_idx[i]:]:
+                    sample_rows[N].append(out_line)
+
+            flat = lines.ravel()
+            part_file.write(flat[flat != 0].tobytes())
+
+            if appender is not None:
+                clean_total_f = to_float(clean_total)
+                clean_pass_f = to_float(clean_passenger)
+                columns = {
+                    "clean_total": clean_total_f,
+                    "clean_pass": clean_pass_f,
+                    "dirty_total": dirty_floats(clean_total_f, clean_total, dirty_total),
+                    "dirty_pass": dirty_floats(clean_pass_f, clean_passenger, dirty_passenger),
+                    "numdup": num_dup.astype(np.float64),
+                }
+                # rows the text parsers skip (empty passenger_count) stay out of the store
+                valid = ~np.isnan(np.column_stack(list(columns.values()))).any(axis=1)
+                appender.append({name: col[valid] for name, col in columns.items()})
 
-            all_dirty_file.write(out_line)
+    if appender is not None:
+        appender.close()
+    return counts, sample_rows
 
-    for f in sample_files.values():
-        f.close()
+def merge_parts(part_paths, dest):
+    """Concatenate the per-shard outputs into dest, in shard order."""
+    if len(part_paths) == 1:
+        os.replace(part_paths[0], dest)
+        return
+    with open(dest, "wb") as fout:
+        for part in part_paths:
+            with open(part, "rb") as fin:
+                shutil.copyfileobj(fin, fout)
+            os.remove(part)
+
+def main():
+    seed_seq = np.random.SeedSequence(SEED)
+    print(f"Master seed: {seed_seq.entropy} ({NUM_SHARDS} shard(s))")
+
+    part_suffixes = [f".part{k}" for k in range(NUM_SHARDS)]
+    hash_key = int(seed_seq.generate_state(1, np.uint64)[0])
+    tasks = [
+        (start, end, shard_seq, hash_key, suffix)
+        for (start, end), shard_seq, suffix in zip(
+            shard_bounds(INPUT_FILE, NUM_SHARDS), seed_seq.spawn(NUM_SHARDS), part_suffixes
+        )
+    ]
+    if NUM_SHARDS == 1:
+        results = [process_shard(tasks[0])]
+    else:
+        with Pool(min(NUM_WORKERS, NUM_SHARDS)) as pool:
+            results = pool.map(process_shard, tasks)
+
+    merge_parts([ALLDIRTY_FILE + suffix for suffix in part_suffixes], ALLDIRTY_FILE)
+    if WRITE_COLUMNAR:
+        columnar_store.finish_store(columnar_store.store_path(ALLDIRTY_FILE), part_suffixes)
+
+    total_lines = sum(counts["total_lines"] for counts, _ in results)
+    dirty_value_changes = sum(counts["dirty_value_changes"] for counts, _ in results)
+    duplicate_count = sum(counts["duplicate_count"] for counts, _ in results)
+
+    # Write each sample file in one go, shards in input order
+    for N in SAMPLE_SIZES:
+        fname = os.path.join(OUTPUT_DIR, f"sample_ytd_{N}.tbl")
+        with open(fname, "wb") as f:
+            for _, sample_rows in results:
+                f.writelines(sample_rows[N])
+        if WRITE_COLUMNAR:
+            columnar_store.write_store(columnar_store.store_path(fname), columnar_store.parse_tbl(fname))
+
+    if STRATIFIED:
+        stratified.write_samples(
+            ALLDIRTY_FILE, SAMPLE_SIZES,
+            np.random.default_rng(np.random.SeedSequence([seed_seq.entropy, 1])),
+        )
 
     print("=== Summary ===")
     print(f"Total lines processed: {total_lines}")
@@ -127,4 +372,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -1,9 +1,20 @@
 import numpy as np
+import columnar_store
+import ground_truth
 #####                    YELLOW TAXI
 
 # === Configuration ===
 INPUT_FILE = "dirty_ytd_2024-11_12.tbl"
 PRED_PASSENGER = 1.0   # passenger_count == 1
+PREDICATE = {"passenger_count": PRED_PASSENGER}
+
+# Dirty population written by Generate_dirty_YT; a row joins sample S with probability
+# S * numdup / TOT_DIRTY_LINES (the generator, monte_carlo, sequential and line_index)
+DUP_ERR_PROB = 0.20   # duplication
+TOT_LINE_NUMBER = 6614775
+TOT_DIRTY_LINES = TOT_LINE_NUMBER * (1 + DUP_ERR_PROB)
+
+CHUNK_ROWS = 1000000   # rows per chunk; memory stays constant in the input size
 
 '''
 === ALL CLEAN ===
@@ -17,74 +28,116 @@ SUM:   196872450.280
 AVG:   34.840279
 '''
 
-def parse_line(line):
-    parts = line.strip().split("|")
-    if len(parts) < 5:
-        return None
-    try:
-        clean_total = float(parts[0])
-        clean_pass  = float(parts[1])
-        dirty_total = float(parts[2])
-        dirty_pass  = float(parts[3])
-        numdup      = float(parts[4])
-        return clean_total, clean_pass, dirty_total, dirty_pass, numdup
-    except ValueError:
-        return None
+class StreamingAggregate:
+    """
+    Weighted COUNT / SUM / mean / variance of one predicate, updated chunk by chunk.
+    The running sum is Neumaier-compensated; mean and M2 are merged Welford-style
+    (Chan et al.), so only a handful of floats are kept however large the input is.
+    """
+
+    def __init__(self):
+        self.count = 0.0
+        self._sum = 0.0
+        self._comp = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values, weights):
+        w = float(np.sum(weights))
+        if w == 0:
+            return
+        s = float(np.dot(values, weights))
+
+        t = self._sum + s
+        if abs(self._sum) >= abs(s):
+            self._comp += (self._sum - t) + s
+        else:
+            self._comp += (s - t) + self._sum
+        self._sum = t
+
+        chunk_mean = s / w
+        chunk_m2 = float(np.dot(weights, (values - chunk_mean) ** 2))
+        delta = chunk_mean - self.mean
+        total = self.count + w
+        self.mean += delta * w / total
+        self.m2 += chunk_m2 + delta * delta * self.count * w / total
+        self.count = total
+
+    @property
+    def sum(self):
+        return self._sum + self._comp
+
+    @property
+    def avg(self):
+        return self.sum / self.count
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / self.count)
 
 
 def compute_aggregates(path):
-    clean_vals, dirty_vals = [], []
-    clean_dups, dirty_dups = [], []
-
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            parsed = parse_line(line)
-            if parsed is None:
-                continue
+    clean = StreamingAggregate()
+    dirty = StreamingAggregate()
 
-            (clean_total, clean_pass, dirty_total, dirty_pass, numdup) = parsed
+    for cols in columnar_store.iter_table_chunks(path, CHUNK_ROWS):
+        # Predicate: passenger_count == 1
+        clean_match = cols["clean_pass"] == PRED_PASSENGER
+        dirty_match = cols["dirty_pass"] == PRED_PASSENGER
 
-            # Predicate: passenger_count == 1
-            if clean_pass == PRED_PASSENGER:
-                clean_vals.append(clean_total)
-                clean_dups.append(1)     # clean lines are not duplicated in original data
+        # Weighted aggregates; clean lines are not duplicated in original data
+        clean.update(cols["clean_total"][clean_match], np.ones(int(clean_match.sum())))
+        dirty.update(cols["dirty_total"][dirty_match], cols["numdup"][dirty_match])
 
-            if dirty_pass == PRED_PASSENGER:
-                dirty_vals.append(dirty_total)
-                dirty_dups.append(numdup)  # dirty duplication factor
-
-    if not clean_vals or not dirty_vals:
+    if clean.count == 0 or dirty.count == 0:
         print("No matching rows for predicate.")
         return
 
-    clean_vals = np.array(clean_vals)
-    dirty_vals = np.array(dirty_vals)
-    clean_dups = np.array(clean_dups)
-    dirty_dups = np.array(dirty_dups)
+    print("=== ALL CLEAN ===")
+    print(f"COUNT: {clean.count:.0f}")
+    print(f"SUM:   {clean.sum:.3f}")
+    print(f"AVG:   {clean.avg:.6f}")
+    print(f"STD:   {clean.std:.6f}")
+    print()
+    print("=== ALL DIRTY ===")
+    print(f"COUNT: {dirty.count:.0f}")
+    print(f"SUM:   {dirty.sum:.3f}")
+    print(f"AVG:   {dirty.avg:.6f}")
+    print(f"STD:   {dirty.std:.6f}")
+
+    return {
+        "clean": {"count": clean.count, "sum": clean.sum, "avg": clean.avg},
+        "dirty": {"count": dirty.count, "sum": dirty.sum, "avg": dirty.avg},
+    }
 
-    # Weighted aggregates
-    clean_sum = np.sum(clean_vals * clean_dups)
-    dirty_sum = np.sum(dirty_vals * dirty_dups)
 
-    clean_count = np.sum(clean_dups)
-    dirty_count = np.sum(dirty_dups)
+def true_values(path=INPUT_FILE, refresh=False):
+    """ALL CLEAN / ALL DIRTY aggregates of path, from its ground-truth sidecar (computed on a miss)."""
+    return ground_truth.get(path, PREDICATE, compute_aggregates, refresh=refresh)
 
-    clean_avg = clean_sum / clean_count
-    dirty_avg = dirty_sum / dirty_count
 
-    print("=== ALL CLEAN ===")
-    print(f"COUNT: {clean_count:.0f}")
-    print(f"SUM:   {clean_sum:.3f}")
-    print(f"AVG:   {clean_avg:.6f}")
-    print()
-    print("=== ALL DIRTY ===")
-    print(f"COUNT: {dirty_count:.0f}")
-    print(f"SUM:   {dirty_sum:.3f}")
-    print(f"AVG:   {dirty_avg:.6f}")
+def stored_true_values(path=INPUT_FILE):
+    """
+    ALL CLEAN / ALL DIRTY of path as stored in its ground-truth sidecar, never computed here
+    (for the plot scripts, which otherwise only need the result CSVs).
+    """
+    try:
+        return ground_truth.get(path, PREDICATE)
+    except (KeyError, FileNotFoundError) as e:
+        raise RuntimeError(
+            f"No ground truth stored for {path} ({e}). Run `python all_infos.py` next to the dirty "
+            f"file first; it writes {ground_truth.sidecar_path(path)}."
+        ) from None
 
 
-if __name__ == "__main__":
-    compute_aggregates(INPUT_FILE)
+def fill_results(results, path=INPUT_FILE):
+    """Add the stored ALL_CLEAN / ALL_DIRTY of path to each aggregate entry of a plot's results dict."""
+    truth = stored_true_values(path)
+    for agg, entry in results.items():
+        entry.update(ALL_CLEAN=truth["clean"][agg], ALL_DIRTY=truth["dirty"][agg])
+    return results
 
+
+if __name__ == "__main__":
+    true_values(INPUT_FILE, refresh=True)
+    print(f"\nSaved ground truth → {ground_truth.sidecar_path(INPUT_FILE)}")
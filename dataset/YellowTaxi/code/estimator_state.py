@@ -0,0 +1,142 @@
+import numpy as np
+import all_infos
+
+# === Incremental RawSC / NormalizedSC state ===
+# Every φ_clean(t) and φ_dirty(t) of the estimators is a linear combination of four
+# per-row terms (see TERMS), with coefficients that only depend on sample-level counts
+# (K, K_pred, d). So a sample is summarized by those counts, Σ 1/numdup, and the mean
+# vector and co-moment matrix of the terms. update() folds in a batch of rows in O(Δ),
+# merge() combines the states of disjoint parts exactly (Chan et al., as in
+# all_infos.StreamingAggregate), and the estimates can be read off at any point.
+
+# === Configuration ===
+N = 7937540   # total population size, as in the estimators
+Z = 1.96      # CI = estimate ± Z * sqrt(variance / sample_size), as in the plots
+
+AGGREGATES = ["count", "sum", "avg"]
+
+# Per-row terms: pred_clean/numdup, pred_clean*clean/numdup, pred_dirty, pred_dirty*dirty
+TERMS = ["clean_count", "clean_sum", "dirty_count", "dirty_sum"]
+
+
+def batch_from_columns(cols, pred_passenger=all_infos.PRED_PASSENGER):
+    """Predicate flags, values and numdup of a chunk of columnar_store columns."""
+    return {
+        "pred_clean": cols["clean_pass"] == pred_passenger,
+        "pred_dirty": cols["dirty_pass"] == pred_passenger,
+        "clean": np.asarray(cols["clean_total"], dtype=np.float64),
+        "dirty": np.asarray(cols["dirty_total"], dtype=np.float64),
+        "numdup": np.asarray(cols["numdup"], dtype=np.float64),
+    }
+
+
+class EstimatorState:
+    """Mergeable sufficient statistics of a sample for RawSC and NormalizedSC."""
+
+    def __init__(self, n_population=N):
+        self.n_population = n_population
+        self.K = 0
+        self.K_pred_clean = 0
+        self.K_pred_dirty = 0
+        self.inv_numdup = 0.0                          # Σ 1/numdup
+        self.mean = np.zeros(len(TERMS))
+        self.m2 = np.zeros((len(TERMS), len(TERMS)))   # Σ (x - mean)(x - mean)^T
+
+    @classmethod
+    def from_batch(cls, batch, n_population=N):
+        state = cls(n_population)
+        n = len(batch["numdup"])
+        if n == 0:
+            return state
+        pc = np.asarray(batch["pred_clean"], dtype=np.float64)
+        pd = np.asarray(batch["pred_dirty"], dtype=np.float64)
+        inv = 1.0 / np.asarray(batch["numdup"], dtype=np.float64)
+        x = np.column_stack([pc * inv, pc * batch["clean"] * inv, pd, pd * batch["dirty"]])
+
+        state.K = n
+        state.K_pred_clean = int(np.count_nonzero(batch["pred_clean"]))
+        state.K_pred_dirty = int(np.count_nonzero(batch["pred_dirty"]))
+        state.inv_numdup = float(np.sum(inv))
+        state.mean = x.mean(axis=0)
+        dev = x - state.mean
+        state.m2 = dev.T @ dev
+        return state
+
+    def update(self, batch):
+        """Add a batch of sample rows (dict of arrays, as batch_from_columns returns)."""
+        self.merge(EstimatorState.from_batch(batch, self.n_population))
+        return self
+
+    def merge(self, other):
+        """Add the rows summarized by other (a disjoint part of the same sample)."""
+        if other.K == 0:
+            return self
+        total = self.K + other.K
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.K / total)
+        self.m2 = self.m2 + other.m2 + np.outer(delta, delta) * (self.K * other.K / total)
+        self.K = total
+        self.K_pred_clean += other.K_pred_clean
+        self.K_pred_dirty += other.K_pred_dirty
+        self.inv_numdup += other.inv_numdup
+        return self
+
+    def _coefficients(self):
+        """Coefficients of φ_clean and φ_dirty on TERMS, per aggregate."""
+        n = self.n_population
+        d = self.K / self.inv_numdup
+        c_avg_clean = d * self.K / self.K_pred_clean if self.K_pred_clean else 0.0
+        c_avg_dirty = self.K / self.K_pred_dirty if self.K_pred_dirty else 0.0
+        clean = {
+            "count": np.array([n, 0.0, 0.0, 0.0]),
+            "sum": np.array([0.0, n, 0.0, 0.0]),
+            "avg": np.array([0.0, c_avg_clean, 0.0, 0.0]),
+        }
+        dirty = {
+            "count": np.array([0.0, 0.0, n, 0.0]),
+            "sum": np.array([0.0, 0.0, 0.0, n]),
+            "avg": np.array([0.0, 0.0, 0.0, c_avg_dirty]),
+        }
+        return clean, dirty
+
+    def _mean_var(self, coef):
+        """Mean and variance (ddof=1, 0 for K <= 1) of coef · x over the sample rows."""
+        mean = float(coef @ self.mean)
+        var = float(coef @ self.m2 @ coef) / (self.K - 1) if self.K > 1 else 0.0
+        return mean, max(var, 0.0)
+
+    def rawsc(self):
+        """{agg: (estimate, variance)} of RawSC, or None without rows matching the predicate."""
+        if self.K == 0 or self.K_pred_clean == 0:
+            return None
+        clean, _ = self._coefficients()
+        return {agg: self._mean_var(clean[agg]) for agg in AGGREGATES}
+
+    def normalizedsc(self, all_dirty):
+        """{agg: (estimate, variance)} of NormalizedSC = ALL DIRTY - mean(q), or None."""
+        if self.K == 0 or (self.K_pred_clean == 0 and self.K_pred_dirty == 0):
+            return None
+        clean, dirty = self._coefficients()
+        out = {}
+        for agg in AGGREGATES:
+            mean_q, var_q = self._mean_var(dirty[agg] - clean[agg])
+            out[agg] = (all_dirty[agg] - mean_q, var_q)
+        return out
+
+    def confidence_intervals(self, all_dirty=None, sample_size=None, z=Z):
+        """
+        {(estimator, agg): (estimate, low, high)} for RawSC and, given ALL DIRTY, NormalizedSC.
+        sample_size defaults to the number of rows seen (K).
+        """
+        sample_size = sample_size or self.K
+        results = {"rawsc": self.rawsc()}
+        if all_dirty is not None:
+            results["normalizedsc"] = self.normalizedsc(all_dirty)
+        out = {}
+        for estimator, res in results.items():
+            if res is None:
+                continue
+            for agg, (est, var) in res.items():
+                half = z * float(np.sqrt(var / sample_size))
+                out[(estimator, agg)] = (est, est - half, est + half)
+        return out
@@ -0,0 +1,259 @@
+import os
+import glob
+import csv
+import numpy as np
+import columnar_store
+import estimator_state
+import ground_truth
+import workload
+
+# === GROUP BY estimation ===
+# RawSC / NormalizedSC per group of GROUP_BY (e.g. AVG(total_amount) per passenger_count).
+# Group keys are factorized once against the groups of the population, and every
+# per-group sufficient statistic (counts, the sums of the four EstimatorState terms and
+# their products) is one np.bincount over the group codes, so thousands of groups cost
+# the same handful of vectorized passes as one. A row counts for group g on the clean
+# side when its clean key is g, on the dirty side when its dirty key is g.
+
+# === Configuration ===
+INPUT_DIR = "sample/"
+SAMPLE_PATTERN = workload.SAMPLE_PATTERN
+DIRTY_FILE = workload.DIRTY_FILE
+OUTPUT_CSV = "group_by_results_ytd.csv"
+
+GROUP_BY = "passenger_count"   # attribute of workload.ATTRIBUTES
+ATTRIBUTE = "total_amount"     # aggregated attribute
+PREDICATE = {}                 # extra filter, in the workload predicate format
+
+# Indices into estimator_state.TERMS of the clean-side and the dirty-side terms
+CLEAN_TERMS, DIRTY_TERMS = (0, 1), (2, 3)
+
+
+def group_codes(keys, labels):
+    """Code of every key in the sorted labels array (-1 where the key is not a label)."""
+    if len(labels) == 0:
+        return np.full(len(keys), -1)
+    idx = np.minimum(np.searchsorted(labels, keys), len(labels) - 1)
+    return np.where(labels[idx] == keys, idx, -1)
+
+
+def grouped_batch(cols, labels, group_by=GROUP_BY, attribute=ATTRIBUTE, predicate=PREDICATE):
+    """Estimator batch of a sample plus the clean / dirty group code of every row."""
+    mask = workload.compile_predicate(predicate)
+    clean_key, dirty_key = workload.ATTRIBUTES[group_by]
+    clean_col, dirty_col = workload.ATTRIBUTES[attribute]
+    return {
+        "pred_clean": mask(cols, 0),
+        "pred_dirty": mask(cols, 1),
+        "clean": np.asarray(cols[clean_col], dtype=np.float64),
+        "dirty": np.asarray(cols[dirty_col], dtype=np.float64),
+        "numdup": np.asarray(cols["numdup"], dtype=np.float64),
+        "group_clean": group_codes(np.asarray(cols[clean_key]), labels),
+        "group_dirty": group_codes(np.asarray(cols[dirty_key]), labels),
+    }
+
+
+def group_stats(batch, n_groups):
+    """
+    Per-group sufficient statistics in one set of bincounts: K and Σ 1/numdup (shared by
+    all groups), the per-group predicate counts, term sums s (G, 4) and Gram matrix (G, 4, 4).
+    """
+    inv = 1.0 / batch["numdup"]
+    gc = np.where(batch["pred_clean"], batch["group_clean"], -1)
+    gd = np.where(batch["pred_dirty"], batch["group_dirty"], -1)
+    in_c = gc >= 0
+    in_d = gd >= 0
+
+    # Non-zero terms of each side: [pc*inv, pc*clean*inv] and [pd, pd*dirty]
+    xc = np.column_stack([inv, batch["clean"] * inv])[in_c]
+    xd = np.column_stack([np.ones(len(inv)), batch["dirty"]])[in_d]
+    gc, gd = gc[in_c], gd[in_d]
+
+    def count(codes, weights=None):
+        return np.bincount(codes, weights, minlength=n_groups)[:n_groups]
+
+    s = np.zeros((n_groups, 4))
+    gram = np.zeros((n_groups, 4, 4))
+    for a, i in enumerate(CLEAN_TERMS):
+        s[:, i] = count(gc, xc[:, a])
+        for b, j in enumerate(CLEAN_TERMS):
+            gram[:, i, j] = count(gc, xc[:, a] * xc[:, b])
+    for a, i in enumerate(DIRTY_TERMS):
+        s[:, i] = count(gd, xd[:, a])
+        for b, j in enumerate(DIRTY_TERMS):
+            gram[:, i, j] = count(gd, xd[:, a] * xd[:, b])
+
+    # Cross products: rows whose clean and dirty key fall in the same group
+    both = in_c & in_d & (batch["group_clean"] == batch["group_dirty"])
+    gb = batch["group_clean"][both]
+    xcb = np.column_stack([inv, batch["clean"] * inv])[both]
+    xdb = np.column_stack([np.ones(len(inv)), batch["dirty"]])[both]
+    for a, i in enumerate(CLEAN_TERMS):
+        for b, j in enumerate(DIRTY_TERMS):
+            gram[:, i, j] = gram[:, j, i] = count(gb, xcb[:, a] * xdb[:, b])
+
+    return {
+        "K": len(inv),
+        "inv_numdup": float(np.sum(inv)),
+        "K_pred_clean": count(gc),
+        "K_pred_dirty": count(gd),
+        "s": s,
+        "gram": gram,
+    }
+
+
+def estimates(stats, all_dirty=None, n_population=estimator_state.N):
+    """
+    {(estimator, agg): (estimate, variance)} arrays over the groups, same formulas as
+    EstimatorState; nan for a group without rows matching on the needed side.
+    all_dirty holds ALL DIRTY per group: {agg: array}.
+    """
+    K = stats["K"]
+    n = n_population
+    kpc, kpd = stats["K_pred_clean"], stats["K_pred_dirty"]
+    G = len(kpc)
+    d = K / stats["inv_numdup"] if stats["inv_numdup"] else 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        c_avg_clean = np.where(kpc > 0, d * K / kpc, 0.0)
+        c_avg_dirty = np.where(kpd > 0, K / kpd, 0.0)
+
+    zero = np.zeros(G)
+    full = np.full(G, float(n))
+    clean = {
+        "count": np.column_stack([full, zero, zero, zero]),
+        "sum": np.column_stack([zero, full, zero, zero]),
+        "avg": np.column_stack([zero, c_avg_clean, zero, zero]),
+    }
+    dirty = {
+        "count": np.column_stack([zero, zero, full, zero]),
+        "sum": np.column_stack([zero, zero, zero, full]),
+        "avg": np.column_stack([zero, zero, zero, c_avg_dirty]),
+    }
+
+    def mean_var(coef):
+        total = np.einsum("gi,gi->g", coef, stats["s"])
+        mean = total / K if K else np.full(G, np.nan)
+        if K <= 1:
+            return mean, np.zeros(G)
+        sq = np.einsum("gi,gij,gj->g", coef, stats["gram"], coef)
+        return mean, np.maximum(sq - total * mean, 0.0) / (K - 1)
+
+    raw_valid = kpc > 0
+    norm_valid = (kpc > 0) | (kpd > 0)
+    out = {}
+    for agg in estimator_state.AGGREGATES:
+        mean, var = mean_var(clean[agg])
+        out[("rawsc", agg)] = (np.where(raw_valid, mean, np.nan), np.where(raw_valid, var, np.nan))
+        if all_dirty is not None:
+            mean_q, var_q = mean_var(dirty[agg] - clean[agg])
+            est = np.asarray(all_dirty[agg], dtype=np.float64) - mean_q
+            out[("normalizedsc", agg)] = (np.where(norm_valid, est, np.nan),
+                                          np.where(norm_valid, var_q, np.nan))
+    return out
+
+
+def _merge_groups(labels, values):
+    """Sum per-chunk group results: labels (concatenated) and {name: values} -> sorted labels, sums."""
+    if not labels:
+        return np.empty(0), {name: np.empty(0) for name in values}
+    uniq, inverse = np.unique(np.concatenate(labels), return_inverse=True)
+    return uniq, {name: np.bincount(inverse, np.concatenate(v), len(uniq)) for name, v in values.items()}
+
+
+def compute_true_values(path=DIRTY_FILE, group_by=GROUP_BY, attribute=ATTRIBUTE, predicate=PREDICATE):
+    """
+    ALL CLEAN / ALL DIRTY per group in one scan of the dirty file (weights as in all_infos).
+    Groups are the clean and dirty keys of the rows matching the predicate.
+    """
+    mask = workload.compile_predicate(predicate)
+    clean_key, dirty_key = workload.ATTRIBUTES[group_by]
+    clean_col, dirty_col = workload.ATTRIBUTES[attribute]
+    sides = {"clean": ([], {"count": [], "sum": []}), "dirty": ([], {"count": [], "sum": []})}
+
+    for cols in columnar_store.iter_table_chunks(path):
+        numdup = np.asarray(cols["numdup"], dtype=np.float64)
+        for side, key_col, val_col, weights in (
+            ("clean", clean_key, clean_col, np.ones(len(numdup))),
+            ("dirty", dirty_key, dirty_col, numdup),
+        ):
+            match = mask(cols, 0 if side == "clean" else 1)
+            uniq, inverse = np.unique(np.asarray(cols[key_col])[match], return_inverse=True)
+            labels, values = sides[side]
+            labels.append(uniq)
+            values["count"].append(np.bincount(inverse, weights[match], len(uniq)))
+            values["sum"].append(np.bincount(inverse, weights[match] * cols[val_col][match], len(uniq)))
+
+    out = {}
+    for side, (labels, values) in sides.items():
+        uniq, sums = _merge_groups(labels, values)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            avg = np.where(sums["count"] > 0, sums["sum"] / sums["count"], 0.0)
+        out[side] = {
+            "labels": [v.decode() if isinstance(v, bytes) else float(v) for v in uniq.tolist()],
+            "count": sums["count"].tolist(), "sum": sums["sum"].tolist(), "avg": avg.tolist(),
+        }
+    return out
+
+
+def true_values(path=DIRTY_FILE, group_by=GROUP_BY, attribute=ATTRIBUTE, predicate=PREDICATE, refresh=False):
+    """
+    Sorted group labels of the population and {"clean"/"dirty": {agg: array}} aligned with
+    them (0 for a group absent on one side), cached in the ground-truth sidecar of path.
+    """
+    key = {"group_by": group_by, "attribute": attribute, "predicate": predicate}
+    truth = ground_truth.get(
+        path, key, lambda p: compute_true_values(p, group_by, attribute, predicate), refresh=refresh
+    )
+    to_key = lambda v: v.encode() if isinstance(v, str) else v
+    side_labels = {side: np.array([to_key(v) for v in truth[side]["labels"]]) for side in ("clean", "dirty")}
+    labels = np.unique(np.concatenate([side_labels["clean"], side_labels["dirty"]]))
+
+    aligned = {}
+    for side in ("clean", "dirty"):
+        codes = group_codes(side_labels[side], labels)
+        aligned[side] = {}
+        for agg in estimator_state.AGGREGATES:
+            values = np.zeros(len(labels))
+            values[codes] = truth[side][agg]
+            aligned[side][agg] = values
+    return labels, aligned
+
+
+def label_text(label):
+    return label.decode() if isinstance(label, bytes) else label
+
+
+def main():
+    labels, truth = true_values()
+    files = sorted(glob.glob(os.path.join(INPUT_DIR, SAMPLE_PATTERN)))
+    if not files:
+        print("No sample files found in", INPUT_DIR)
+        return
+
+    rows = []
+    for file in files:
+        sample_size = int(os.path.basename(file).split("_")[-1].split(".")[0])
+        batch = grouped_batch(columnar_store.load_table(file), labels)
+        res = estimates(group_stats(batch, len(labels)), truth["dirty"])
+        for (estimator, agg), (est, var) in res.items():
+            half = estimator_state.Z * np.sqrt(var / sample_size)
+            for g in np.flatnonzero(~np.isnan(est)):
+                rows.append({
+                    "sample_size": sample_size, "group": label_text(labels[g].item()),
+                    "estimator": estimator, "aggregate": agg, "estimate": est[g], "variance": var[g],
+                    "ci_low": est[g] - half[g], "ci_high": est[g] + half[g],
+                })
+        print(f"Processed {file} ({len(labels)} groups of {GROUP_BY}) ✅")
+
+    rows.sort(key=lambda r: (r["sample_size"], str(r["group"]), r["estimator"], r["aggregate"]))
+    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=[
+            "sample_size", "group", "estimator", "aggregate", "estimate", "variance", "ci_low", "ci_high",
+        ])
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Saved results → {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import os
+import sys
+import mmap
+import numpy as np
+import columnar_store
+import monte_carlo
+
+# === Line index ===
+# A compact index next to a dirty .tbl file (dirty_ytd_2024-11_12.tbl -> dirty_ytd_2024-11_12.lineidx.npz)
+# holding the byte offset of every line start (uint64, plus the file size as end marker)
+# and the numdup column. With it a fresh sample of any size is drawn by reading only the
+# selected lines through mmap, instead of re-running the generator over the raw input.
+
+# === Configuration ===
+INPUT_FILE = "dirty_ytd_2024-11_12.tbl"
+OUTPUT_DIR = "sample/"
+SAMPLE_PREFIX = "sample_ytd_"
+
+BLOCK_BYTES = 64 * 1024 * 1024   # file read per block while indexing
+
+# Also write the columnar store of every drawn sample, as Generate_dirty_YT does
+WRITE_COLUMNAR = True
+
+
+def index_path(tbl_path):
+    """Index file that belongs to a .tbl file."""
+    return os.path.splitext(tbl_path)[0] + ".lineidx.npz"
+
+
+def build_index(tbl_path):
+    """Scan the file once and save line offsets and numdup (the last field of every line)."""
+    offsets = [np.zeros(1, dtype=np.uint64)]
+    numdups = []
+    pos = 0
+    lines = 0
+    tail = b""
+    with open(tbl_path, "rb") as f:
+        while True:
+            data = f.read(BLOCK_BYTES)
+            if not data:
+                break
+            data = tail + data
+            cut = data.rfind(b"\n") + 1
+            tail = data[cut:]
+            if cut:
+                block = np.frombuffer(data, dtype=np.uint8, count=cut)
+                ends = np.flatnonzero(block == ord("\n"))
+                pipes = np.flatnonzero(block == ord("|"))
+                # numdup follows the last '|' of the line; it must lie inside the line
+                last = np.searchsorted(pipes, ends) - 1
+                starts = np.concatenate(([0], ends[:-1] + 1))
+                bad = (last < 0) | (pipes[np.maximum(last, 0)] < starts) if len(pipes) else np.ones(len(ends), dtype=bool)
+                if bad.any():
+                    first = int(np.argmax(bad))
+                    raise ValueError(f"{tbl_path}: line {lines + first + 1} (byte {pos + int(starts[first])}) "
+                                     f"has no '|' field separator")
+                begin = pipes[last] + 1
+                width = max(int((ends - begin).max()), 1)
+                cols = begin[:, None] + np.arange(width)
+                field = block[np.minimum(cols, cut - 1)]
+                field[cols >= ends[:, None]] = ord(" ")
+                numdups.append(field.view(f"S{width}").ravel().astype(np.float64))
+                offsets.append((pos + ends + 1).astype(np.uint64))
+                lines += len(ends)
+            pos += cut
+    if tail:
+        raise ValueError(f"{tbl_path} does not end with a newline")
+
+    offsets = np.concatenate(offsets)
+    numdup = np.concatenate(numdups) if numdups else np.empty(0)
+    numdup = numdup.astype(np.min_scalar_type(int(numdup.max(initial=1))))  # uint8 for numdup in {1, 2}
+    st = os.stat(tbl_path)
+    np.savez(index_path(tbl_path), offsets=offsets, numdup=numdup, size=st.st_size, mtime_ns=st.st_mtime_ns)
+    return index_path(tbl_path)
+
+
+def has_index(tbl_path):
+    """True if the .tbl file has an index built from its current contents (same size and mtime)."""
+    path = index_path(tbl_path)
+    if not os.path.isfile(path):
+        return False
+    st = os.stat(tbl_path)
+    with np.load(path) as idx:
+        return int(idx["size"]) == st.st_size and int(idx["mtime_ns"]) == st.st_mtime_ns
+
+
+class LineIndex:
+    """Offset index of one dirty .tbl file, built on first use."""
+
+    def __init__(self, tbl_path=INPUT_FILE):
+        if not has_index(tbl_path):
+            build_index(tbl_path)
+        with np.load(index_path(tbl_path)) as idx:
+            self.offsets = idx["offsets"]
+            self.numdup = idx["numdup"].astype(np.float64)
+        self.tbl_path = tbl_path
+        self._sampler = None
+
+    def __len__(self):
+        return len(self.numdup)
+
+    def draw(self, sample_size, rng):
+        """
+        Row numbers (in file order) of one sample, drawn with the generator's inclusion rule:
+        row i is kept with probability sample_size * numdup[i] / TOT_DIRTY_LINES.
+        """
+        if self._sampler is None:
+            self._sampler = monte_carlo.PoissonSampler(self.numdup)
+        rows, _ = self._sampler.draw(sample_size, 1, rng)
+        return np.sort(rows)
+
+    def read_lines(self, rows):
+        """The raw lines (bytes, with newline) of the given rows, read through mmap."""
+        starts = self.offsets[rows].tolist()
+        ends = self.offsets[np.asarray(rows) + 1].tolist()
+        with open(self.tbl_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return b"".join(mm[s:e] for s, e in zip(starts, ends))
+
+    def write_rows(self, rows, out_path):
+        """Write the given rows (in file order) and their columnar store to out_path."""
+        with open(out_path, "wb") as f:
+            f.write(self.read_lines(rows))
+        if WRITE_COLUMNAR:
+            columnar_store.write_store(columnar_store.store_path(out_path), columnar_store.parse_tbl(out_path))
+
+    def write_sample(self, sample_size, out_path, rng):
+        """Draw one sample and write it (and its columnar store) to out_path; returns its row count."""
+        rows = self.draw(sample_size, rng)
+        self.write_rows(rows, out_path)
+        return len(rows)
+
+
+if __name__ == "__main__":
+    # python line_index.py <sample size> [<sample size> ...]: fresh samples from INPUT_FILE
+    seed_seq = np.random.SeedSequence()
+    print(f"Seed: {seed_seq.entropy}")
+    rng = np.random.default_rng(seed_seq)
+    index = LineIndex(INPUT_FILE)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    for arg in sys.argv[1:]:
+        fname = os.path.join(OUTPUT_DIR, f"{SAMPLE_PREFIX}{int(arg)}.tbl")
+        n = index.write_sample(int(arg), fname, rng)
+        print(f"Wrote {n} rows → {fname}")
@@ -0,0 +1,200 @@
+import csv
+import numpy as np
+import columnar_store
+import estimator_state
+import all_infos
+
+# === Monte Carlo coverage engine ===
+# Loads the dirty population once, draws REPLICATES samples per sample size in memory
+# with the inclusion rule of Generate_dirty_YT (row kept with prob. S * numdup / TOT_DIRTY_LINES),
+# evaluates RawSC and NormalizedSC on all of them at once (segment sums over a flat index
+# array, no sample files) and reports coverage of the 95% CIs, bias and RMSE against ALL CLEAN.
+
+# === Configuration ===
+INPUT_FILE = all_infos.INPUT_FILE
+OUTPUT_CSV = "montecarlo_results_ytd.csv"
+
+SAMPLE_SIZES = list(range(500, 10001, 500))
+REPLICATES = 10000
+SEED = None           # None draws a fresh one (printed so the run can be repeated)
+
+N = 7937540                        # total population size, as in the estimators
+TOT_DIRTY_LINES = all_infos.TOT_DIRTY_LINES  # inclusion denominator of Generate_dirty_YT
+Z = 1.96                           # CI = mean ± Z * sqrt(variance / sample_size), as in the plots
+
+BATCH_ROWS = 4000000   # sampled rows evaluated at a time (bounds memory)
+
+AGGREGATES = ["count", "sum", "avg"]
+
+
+def load_population(path=INPUT_FILE):
+    """Predicate flags, values and numdup of every dirty row, as in-memory arrays."""
+    parts = {"pred_clean": [], "pred_dirty": [], "clean": [], "dirty": [], "numdup": []}
+    for cols in columnar_store.iter_table_chunks(path):
+        for name, values in estimator_state.batch_from_columns(cols).items():
+            parts[name].append(values)
+    return {name: np.concatenate(chunks) for name, chunks in parts.items()}
+
+
+def distinct_positions(counts, n, rng):
+    """
+    For every replicate r draw counts[r] distinct positions in [0, n).
+    Returns (rep, pos): replicate id and position of every drawn row.
+    """
+    rep = np.repeat(np.arange(len(counts)), counts)
+    if len(rep) == 0:
+        return rep, rep.copy()
+    if 2 * counts.max() > n:
+        pos = np.concatenate([rng.choice(n, k, replace=False) for k in counts])
+        return rep, pos
+    pos = rng.integers(0, n, len(rep))
+    # redraw positions that collide within a replicate until there are none
+    while True:
+        key = rep * n + pos
+        order = np.argsort(key, kind="stable")
+        dup = np.zeros(len(rep), dtype=bool)
+        dup[order[1:]] = key[order[1:]] == key[order[:-1]]
+        if not dup.any():
+            return rep, pos
+        pos[dup] = rng.integers(0, n, int(dup.sum()))
+
+
+class PoissonSampler:
+    """
+    Independent-inclusion samples of the population: row i is kept with probability
+    S * numdup[i] / TOT_DIRTY_LINES. Rows sharing a numdup share that probability, so per
+    group the sample size is Binomial and the rows are a uniform draw without replacement.
+    """
+
+    def __init__(self, numdup):
+        self.order = np.argsort(numdup, kind="stable")
+        self.values, self.starts, self.counts = np.unique(
+            numdup[self.order], return_index=True, return_counts=True
+        )
+
+    def draw(self, sample_size, replicates, rng):
+        """(rows, rep): population row and replicate id of every sampled row."""
+        rows, reps = [], []
+        for value, start, count in zip(self.values, self.starts, self.counts):
+            p = min(1.0, sample_size * value / TOT_DIRTY_LINES)
+            k = rng.binomial(count, p, replicates)
+            rep, pos = distinct_positions(k, count, rng)
+            rows.append(self.order[start + pos])
+            reps.append(rep)
+        return np.concatenate(rows), np.concatenate(reps)
+
+
+def segment_mean_var(x, rep, K, replicates):
+    """Per-replicate mean and variance (ddof=1, 0 for K <= 1) of x grouped by rep."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.bincount(rep, x, replicates) / K
+        dev = x - mean[rep]
+        var = np.where(K > 1, np.bincount(rep, dev * dev, replicates) / (K - 1), 0.0)
+    return mean, var
+
+
+def evaluate(pop, rows, rep, replicates, sample_size, all_dirty):
+    """
+    RawSC and NormalizedSC (same formulas as rawSC_all_aggregation / NormalizedSC_all_aggregation)
+    on every replicate. Returns {(estimator, agg): (estimate, variance, valid)} arrays.
+    """
+    pc = pop["pred_clean"][rows].astype(np.float64)
+    pd = pop["pred_dirty"][rows].astype(np.float64)
+    vc = pop["clean"][rows]
+    vd = pop["dirty"][rows]
+    inv = 1.0 / pop["numdup"][rows]
+
+    K = np.bincount(rep, minlength=replicates).astype(np.float64)
+    K_pred_clean = np.bincount(rep, pc, replicates)
+    K_pred_dirty = np.bincount(rep, pd, replicates)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d = K / np.bincount(rep, inv, replicates)
+        c_avg_clean = np.where(K_pred_clean > 0, d * K / K_pred_clean, 0.0)
+        c_avg_dirty = np.where(K_pred_dirty > 0, K / K_pred_dirty, 0.0)
+
+    # φ_clean(t) (RawSC) and q(t) = φ_dirty(t) - φ_clean(t) (NormalizedSC)
+    phi = {
+        "count": pc * N * inv,
+        "sum": pc * N * vc * inv,
+        "avg": pc * c_avg_clean[rep] * vc * inv,
+    }
+    q = {
+        "count": pd * N - phi["count"],
+        "sum": pd * N * vd - phi["sum"],
+        "avg": pd * c_avg_dirty[rep] * vd - phi["avg"],
+    }
+
+    raw_valid = (K > 0) & (K_pred_clean > 0)
+    # as EstimatorState: q(t) is defined as soon as either side has a matching tuple
+    norm_valid = (K > 0) & ((K_pred_clean > 0) | (K_pred_dirty > 0))
+
+    out = {}
+    for agg in AGGREGATES:
+        mean, var = segment_mean_var(phi[agg], rep, K, replicates)
+        out[("rawsc", agg)] = (mean, var, raw_valid)
+        mean_q, var_q = segment_mean_var(q[agg], rep, K, replicates)
+        out[("normalizedsc", agg)] = (all_dirty[agg] - mean_q, var_q, norm_valid)
+    return out
+
+
+def summarize(estimates, variances, sample_size, truth):
+    """Coverage, bias, RMSE and mean width of the CIs over the replicates."""
+    half = Z * np.sqrt(variances / sample_size)
+    err = estimates - truth
+    return {
+        "replicates": len(estimates),
+        "coverage": float(np.mean(np.abs(err) <= half)),
+        "bias": float(np.mean(err)),
+        "rmse": float(np.sqrt(np.mean(err * err))),
+        "mean_ci_width": float(np.mean(2 * half)),
+    }
+
+
+def run(sample_sizes=SAMPLE_SIZES, replicates=REPLICATES, seed=SEED):
+    seed_seq = np.random.SeedSequence(seed)
+    print(f"Master seed: {seed_seq.entropy}")
+    rng = np.random.default_rng(seed_seq)
+
+    truth = all_infos.true_values()
+    all_dirty, all_clean = truth["dirty"], truth["clean"]
+
+    print("Loading population...")
+    pop = load_population(INPUT_FILE)
+    sampler = PoissonSampler(pop["numdup"])
+    print(f"{len(pop['numdup'])} rows loaded.")
+
+    rows_out = []
+    for S in sample_sizes:
+        collected = {}
+        batch = max(1, BATCH_ROWS // S)
+        for first in range(0, replicates, batch):
+            r = min(batch, replicates - first)
+            rows, rep = sampler.draw(S, r, rng)
+            for key, (est, var, valid) in evaluate(pop, rows, rep, r, S, all_dirty).items():
+                parts = collected.setdefault(key, ([], []))
+                parts[0].append(est[valid])
+                parts[1].append(var[valid])
+
+        for (estimator, agg), (est, var) in collected.items():
+            stats = summarize(np.concatenate(est), np.concatenate(var), S, all_clean[agg])
+            rows_out.append({"estimator": estimator, "aggregate": agg, "sample_size": S, **stats})
+            print(f"S={S:>6} {estimator:>12} {agg:>5}: coverage={stats['coverage']:.3f} "
+                  f"bias={stats['bias']:.6g} rmse={stats['rmse']:.6g} ({stats['replicates']} replicates)")
+    return rows_out
+
+
+def main():
+    rows = run()
+    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=[
+            "estimator", "aggregate", "sample_size", "replicates",
+            "coverage", "bias", "rmse", "mean_ci_width",
+        ])
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Saved results → {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,15 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+import all_infos
 
 # ----------------------------
 # CONFIG
 # ----------------------------
 ALL_RESULTS = {
-    "count": {"ALL_DIRTY": 5650714, "ALL_CLEAN": 5059647, "Y_LABEL": "COUNT"},
-    "sum":   {"ALL_DIRTY": 196872450, "ALL_CLEAN": 138787132, "Y_LABEL": "SUM"},
-    "avg":   {"ALL_DIRTY": 34.84, "ALL_CLEAN": 27.43, "Y_LABEL": "AVG"},
+    "count": {"Y_LABEL": "COUNT"},
+    "sum":   {"Y_LABEL": "SUM"},
+    "avg":   {"Y_LABEL": "AVG"},
 }
 
 
@@ -100,6 +101,7 @@ def plot_best_estimator(agg_name):
 
 
 def main():
+    all_infos.fill_results(ALL_RESULTS)
     for agg in ["avg", "count", "sum"]:
         plot_best_estimator(agg)
 
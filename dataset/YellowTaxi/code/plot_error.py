@@ -1,14 +1,15 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+import all_infos
 
 Z = 1.96  # 95% confidence
 
 # === CONFIGURATION ===
 ALL_RESULTS = {
-    "count": {"ALL_DIRTY": 5650714, "ALL_CLEAN": 5059647, "LABEL": "COUNT"},
-    "sum":   {"ALL_DIRTY": 196872450, "ALL_CLEAN": 138787132, "LABEL": "SUM"},
-    "avg":   {"ALL_DIRTY": 34.84, "ALL_CLEAN": 27.43, "LABEL": "AVG"},
+    "count": {"LABEL": "COUNT"},
+    "sum":   {"LABEL": "SUM"},
+    "avg":   {"LABEL": "AVG"},
 }
 
 
@@ -73,6 +74,7 @@ def plot_ci_percentage_error(agg_name):
 
 
 def main():
+    all_infos.fill_results(ALL_RESULTS)
     for agg in ["avg", "count", "sum"]:
         plot_ci_percentage_error(agg)
 
@@ -2,13 +2,14 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+import all_infos
 #####                    YELLOW TAXI
 
 # === CONFIGURATION (FILL THESE VALUES AFTER RUNNING compute_aggregates) ===
 ALL_RESULTS = {
-    "count": {"ALL_DIRTY": 5650714, "ALL_CLEAN": 5059647, "Y_LABEL": "COUNT"},
-    "sum":   {"ALL_DIRTY": 196872450, "ALL_CLEAN": 138787132, "Y_LABEL": "SUM"},
-    "avg":   {"ALL_DIRTY": 34.84, "ALL_CLEAN": 27.43, "Y_LABEL": "AVG"},
+    "count": {"Y_LABEL": "COUNT"},
+    "sum":   {"Y_LABEL": "SUM"},
+    "avg":   {"Y_LABEL": "AVG"},
 }
 
 os.makedirs("graphs", exist_ok=True)
@@ -70,6 +71,7 @@ def plot_normalizedsc_result(agg_name):
 
 
 def main():
+    all_infos.fill_results(ALL_RESULTS)
     for agg in ["count", "sum", "avg"]:
         try:
             plot_normalizedsc_result(agg)
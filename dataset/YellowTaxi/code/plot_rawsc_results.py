@@ -1,14 +1,14 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import all_infos
 #####                    YELLOW TAXI
 
 # === CONFIGURATION ===
-# Replace these with the actual results from your ALL CLEAN / ALL DIRTY run
 ALL_RESULTS = {
-    "count": {"ALL_DIRTY": 5650714, "ALL_CLEAN": 5059647, "Y_LABEL": "COUNT"},
-    "sum":   {"ALL_DIRTY": 196872450, "ALL_CLEAN": 138787132, "Y_LABEL": "SUM"},
-    "avg":   {"ALL_DIRTY": 34.84, "ALL_CLEAN": 27.43, "Y_LABEL": "AVG"},
+    "count": {"Y_LABEL": "COUNT"},
+    "sum":   {"Y_LABEL": "SUM"},
+    "avg":   {"Y_LABEL": "AVG"},
 }
 
 # Default total number of elements (only used for axis scaling if needed)
@@ -60,6 +60,7 @@ def plot_rawsc_result(agg_name):
 
 
 def main():
+    all_infos.fill_results(ALL_RESULTS)
     for agg in ["count", "sum", "avg"]:
         try:
             plot_rawsc_result(agg)
@@ -0,0 +1,200 @@
+import os
+import glob
+import csv
+import time
+import numpy as np
+import columnar_store
+import estimator_state
+import all_infos
+
+# === Resampling CI engine ===
+# Loads a sample once into arrays and builds CIs for RawSC / NormalizedSC by batch means
+# (contiguous batches in file order, as the TPC-H RawSC_averaged), delete-one
+# jackknife or a B-replicate bootstrap. A point estimate only needs the column sums of
+# a small per-row matrix (see COLUMNS), so every replicate is one row of a weight matrix
+# and all replicates are evaluated at once: counts @ terms, then vectorized formulas.
+
+# === Configuration ===
+INPUT_DIR = "sample/"
+SAMPLE_PATTERN = "sample_ytd_*.tbl"
+OUTPUT_CSV = "resampling_results_ytd.csv"
+
+METHODS = ["batch_means", "jackknife", "bootstrap"]
+NUM_BATCHES = 5                 # batch means
+BOOTSTRAP_REPLICATES = 2000
+SEED = None                     # None draws a fresh one (printed so the run can be repeated)
+CONFIDENCE = 0.95
+Z = 1.96                        # normal quantile of CONFIDENCE (batch means, jackknife)
+
+REPLICATE_BATCH_ROWS = 4000000  # bootstrap weights materialized at a time (replicates x rows)
+
+# Columns of the per-row matrix; their sums over a replicate give every point estimate
+COLUMNS = ["rows", "pred_clean", "pred_dirty", "inv_numdup"] + estimator_state.TERMS
+
+
+def load_sample(filepath):
+    """Predicate flags, values and numdup of a sample file, parsed once."""
+    return estimator_state.batch_from_columns(columnar_store.load_table(filepath))
+
+
+def row_terms(batch):
+    """(K, len(COLUMNS)) matrix of the per-row terms of a sample."""
+    pc = np.asarray(batch["pred_clean"], dtype=np.float64)
+    pd = np.asarray(batch["pred_dirty"], dtype=np.float64)
+    inv = 1.0 / np.asarray(batch["numdup"], dtype=np.float64)
+    return np.column_stack([
+        np.ones(len(inv)), pc, pd, inv,
+        pc * inv, pc * batch["clean"] * inv, pd, pd * batch["dirty"],
+    ])
+
+
+def point_estimates(sums, all_dirty=None, n_population=estimator_state.N):
+    """
+    RawSC (and, given ALL DIRTY, NormalizedSC) of every replicate from its column sums
+    (R, len(COLUMNS)); same formulas as EstimatorState. Returns {(estimator, agg): (R,)}
+    with nan where a replicate has no row matching the predicate.
+    """
+    K, K_pred_clean, K_pred_dirty, inv, clean_count, clean_sum, dirty_count, dirty_sum = sums.T
+    n = n_population
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d = K / inv
+        avg_clean = np.where(K_pred_clean > 0, d * clean_sum / K_pred_clean, 0.0)
+        avg_dirty = np.where(K_pred_dirty > 0, dirty_sum / K_pred_dirty, 0.0)
+
+        raw_valid = K_pred_clean > 0
+        out = {
+            ("rawsc", "count"): np.where(raw_valid, n * clean_count / K, np.nan),
+            ("rawsc", "sum"): np.where(raw_valid, n * clean_sum / K, np.nan),
+            ("rawsc", "avg"): np.where(raw_valid, avg_clean, np.nan),
+        }
+        if all_dirty is not None:
+            norm_valid = (K_pred_clean > 0) | (K_pred_dirty > 0)
+            q = {
+                "count": n * (dirty_count - clean_count) / K,
+                "sum": n * (dirty_sum - clean_sum) / K,
+                "avg": avg_dirty - avg_clean,
+            }
+            for agg in estimator_state.AGGREGATES:
+                out[("normalizedsc", agg)] = np.where(norm_valid, all_dirty[agg] - q[agg], np.nan)
+    return out
+
+
+# === Replicate column sums: one row per replicate ===
+
+def batch_sums(terms, num_batches=NUM_BATCHES):
+    """
+    Contiguous batches in file order; the last one takes the remainder. With fewer rows
+    than batches every row is its own batch (as np.array_split), so K rows give K batches.
+    """
+    size = len(terms) // num_batches
+    if size == 0:
+        return terms.copy()
+    return np.add.reduceat(terms, np.arange(num_batches) * size, axis=0)
+
+
+def jackknife_sums(terms):
+    """Delete-one replicates: the full sums minus each row."""
+    return terms.sum(axis=0) - terms
+
+
+def bootstrap_sums(terms, replicates, rng):
+    """
+    B resamples with replacement. Indices are drawn as one (b, K) matrix per batch of
+    replicates, turned into a count matrix, and counts @ terms gives all sums at once.
+    """
+    K = len(terms)
+    step = max(1, REPLICATE_BATCH_ROWS // max(K, 1))
+    parts = []
+    for first in range(0, replicates, step):
+        b = min(step, replicates - first)
+        idx = rng.integers(0, K, (b, K))
+        flat = (idx + (np.arange(b) * K)[:, None]).ravel()
+        counts = np.bincount(flat, minlength=b * K).reshape(b, K)
+        parts.append(counts @ terms)
+    return np.concatenate(parts) if parts else np.empty((0, terms.shape[1]))
+
+
+def intervals(terms, all_dirty=None, methods=METHODS, num_batches=NUM_BATCHES,
+              replicates=BOOTSTRAP_REPLICATES, rng=None):
+    """
+    {(method, estimator, agg): (estimate, variance, low, high)} of one sample.
+    batch_means: mean of the batch estimates ± Z * sd / sqrt(batches);
+    jackknife: full-sample estimate ± Z * jackknife standard error;
+    bootstrap: full-sample estimate, percentile interval of the replicates.
+    variance is the variance of the estimate under the method.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    full = point_estimates(terms.sum(axis=0)[None, :], all_dirty)
+    out = {}
+    for method in methods:
+        if method == "batch_means":
+            reps = point_estimates(batch_sums(terms, num_batches), all_dirty)
+        elif method == "jackknife":
+            reps = point_estimates(jackknife_sums(terms), all_dirty)
+        elif method == "bootstrap":
+            reps = point_estimates(bootstrap_sums(terms, replicates, rng), all_dirty)
+        else:
+            raise ValueError(f"Unknown resampling method: {method}")
+
+        for key, values in reps.items():
+            values = values[~np.isnan(values)]
+            estimate = float(full[key][0])
+            if len(values) < 2 or np.isnan(estimate):
+                continue
+            b = len(values)
+            if method == "batch_means":
+                estimate = float(np.mean(values))
+                var = float(np.var(values, ddof=1)) / b
+                half = Z * np.sqrt(var)
+                low, high = estimate - half, estimate + half
+            elif method == "jackknife":
+                var = float((b - 1) / b * np.sum((values - values.mean()) ** 2))
+                half = Z * np.sqrt(var)
+                low, high = estimate - half, estimate + half
+            else:
+                var = float(np.var(values, ddof=1))
+                tail = 50 * (1 - CONFIDENCE)
+                low, high = np.percentile(values, [tail, 100 - tail])
+            out[(method,) + key] = (estimate, var, float(low), float(high))
+    return out
+
+
+def main():
+    seed_seq = np.random.SeedSequence(SEED)
+    print(f"Seed: {seed_seq.entropy}")
+    rng = np.random.default_rng(seed_seq)
+
+    all_dirty = all_infos.true_values()["dirty"]
+
+    files = sorted(glob.glob(os.path.join(INPUT_DIR, SAMPLE_PATTERN)))
+    if not files:
+        print("No sample files found in", INPUT_DIR)
+        return
+
+    rows = []
+    for file in files:
+        sample_size = int(os.path.basename(file).split("_")[-1].split(".")[0])
+        t0 = time.perf_counter()
+        terms = row_terms(load_sample(file))
+        res = intervals(terms, all_dirty, rng=rng)
+        for (method, estimator, agg), (estimate, var, low, high) in sorted(res.items()):
+            rows.append({
+                "sample_size": sample_size, "method": method, "estimator": estimator,
+                "aggregate": agg, "estimate": estimate, "variance": var,
+                "ci_low": low, "ci_high": high,
+            })
+        print(f"Processed {file} ({len(terms)} rows) in {time.perf_counter() - t0:.3f}s ✅")
+
+    rows.sort(key=lambda r: (r["sample_size"], r["method"], r["estimator"], r["aggregate"]))
+    with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=[
+            "sample_size", "method", "estimator", "aggregate",
+            "estimate", "variance", "ci_low", "ci_high",
+        ])
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Saved results → {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
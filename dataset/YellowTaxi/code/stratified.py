@@ -0,0 +1,218 @@
+import os
+import sys
+import glob
+import csv
+import json
+import numpy as np
+import columnar_store
+import estimator_state
+import line_index
+import all_infos
+
+# === Stratified sampling (Neyman allocation) ===
+# The dirty population is cut into strata on a column known before cleaning (quantiles of
+# the dirty total amount, or one stratum per value of e.g. the dirty passenger count). Stratum h gets
+# a share of the sample proportional to N_h * std_h (Neyman), numdup-weighted inside the
+# stratum as in the uniform design: row i of stratum h is kept with probability
+# S * factor_h * numdup_i / TOT, where factor_h = std_h * TOT / Σ_k N_k std_k (N_h = Σ numdup
+# of stratum h, TOT = Σ_h N_h), so the expected sample size stays S. One uniform per row is
+# shared by all sample sizes, so the samples are nested. RawSC / NormalizedSC run per stratum
+# with N_h, and their COUNT / SUM totals and variances are added up; AVG is SUM / COUNT.
+
+# === Configuration ===
+INPUT_FILE = all_infos.INPUT_FILE
+OUTPUT_DIR = "sample_stratified/"
+SAMPLE_PREFIX = "sample_ytd_"
+STRATA_FILE = "strata.json"          # stratum definition and allocation, inside OUTPUT_DIR
+
+SAMPLE_SIZES = list(range(500, 10001, 500))
+STRATUM_COLUMN = "dirty_pass"        # known before cleaning
+NUM_STRATA = None                    # quantile strata of a numeric column; None = one per value
+# Neyman std per stratum: of the dirty SUM terms pred_dirty * dirty_total / numdup of the
+# all_infos predicate (the best pre-cleaning proxy of φ_clean), or of the plain dirty value
+ALLOCATION = "sum"                   # "sum" or "value"
+MIN_FACTOR = 0.5                     # floor on a stratum's rate relative to uniform (before renormalizing)
+SEED = None                          # None draws a fresh one (printed so the run can be repeated)
+
+Z = estimator_state.Z
+
+
+def build_strata(cols, column=STRATUM_COLUMN, num_strata=NUM_STRATA):
+    """Stratum definition: quantile edges of a numeric column, or the values of a flag column."""
+    values = np.asarray(cols[column])
+    if num_strata is None or values.dtype.kind == "S":
+        labels = np.unique(values).tolist()
+        return {"column": column, "labels": [v.decode() if isinstance(v, bytes) else v for v in labels]}
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, num_strata + 1)))
+    return {"column": column, "edges": edges.tolist()}
+
+
+def stratum_ids(cols, strata):
+    """Stratum of every row (0 .. number of strata - 1; -1 for a value outside the labels)."""
+    values = np.asarray(cols[strata["column"]])
+    if "labels" in strata:
+        labels = np.array([v.encode() if isinstance(v, str) else v for v in strata["labels"]])
+        idx = np.minimum(np.searchsorted(labels, values), len(labels) - 1)
+        return np.where(labels[idx] == values, idx, -1)
+    inner = np.asarray(strata["edges"][1:-1])
+    return np.searchsorted(inner, values, side="right")
+
+
+def num_strata(strata):
+    return len(strata["labels"]) if "labels" in strata else max(len(strata["edges"]) - 1, 1)
+
+
+def allocation_values(cols, allocation=ALLOCATION):
+    """Per-row values whose std per stratum drives the allocation (dirty values only)."""
+    batch = estimator_state.batch_from_columns(cols)
+    if allocation == "sum":
+        return batch["pred_dirty"] * batch["dirty"] / batch["numdup"]
+    if allocation == "value":
+        return batch["dirty"]
+    raise ValueError(f"Unknown allocation: {allocation}")
+
+
+def allocate(cols, strata, allocation=ALLOCATION, min_factor=MIN_FACTOR):
+    """Add stratum sizes N_h (Σ numdup), numdup-weighted std_h and the Neyman factors."""
+    ids = stratum_ids(cols, strata)
+    H = num_strata(strata)
+    keep = ids >= 0
+    ids = ids[keep]
+    w = np.asarray(cols["numdup"], dtype=np.float64)[keep]
+    x = allocation_values(cols, allocation)[keep]
+
+    size = np.bincount(ids, w, H)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(size > 0, np.bincount(ids, w * x, H) / size, 0.0)
+        std = np.sqrt(np.maximum(np.bincount(ids, w * (x - mean[ids]) ** 2, H) / size, 0.0))
+    std = np.nan_to_num(std)
+    total = size.sum()
+
+    # factor_h = n_h / (S * N_h / TOT); a floor keeps low-variance strata in the sample
+    factor = std * total / np.dot(size, std) if np.dot(size, std) > 0 else np.ones(H)
+    factor = np.where(size > 0, np.maximum(factor, min_factor), 0.0)
+    factor *= total / np.dot(size, factor)
+
+    return dict(strata, population=size.tolist(), rows=np.bincount(ids, minlength=H).tolist(),
+                std=std.tolist(), factor=factor.tolist(), total=float(total))
+
+
+def write_samples(path=INPUT_FILE, sample_sizes=SAMPLE_SIZES, rng=None, out_dir=OUTPUT_DIR):
+    """Stratify the dirty file, draw every sample size (nested) and write them with strata.json."""
+    rng = rng if rng is not None else np.random.default_rng()
+    cols = columnar_store.load_table(path)
+    strata = allocate(cols, build_strata(cols))
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, STRATA_FILE), "w", encoding="utf-8") as f:
+        json.dump(strata, f, indent=2)
+
+    ids = stratum_ids(cols, strata)
+    numdup = np.asarray(cols["numdup"], dtype=np.float64)
+    rate = np.where(ids >= 0, np.asarray(strata["factor"])[ids], 0.0) * numdup / strata["total"]
+    u = rng.random(len(numdup))
+
+    index = line_index.LineIndex(path)
+    for S in sample_sizes:
+        rows = np.flatnonzero(u < np.minimum(1.0, S * rate))
+        fname = os.path.join(out_dir, f"{SAMPLE_PREFIX}{S}.tbl")
+        index.write_rows(rows, fname)
+        print(f"Wrote {len(rows)} rows → {fname}")
+    return strata
+
+
+def load_strata(out_dir=OUTPUT_DIR):
+    with open(os.path.join(out_dir, STRATA_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _totals(state, coef):
+    """Per-stratum totals coef @ mean and their covariance (ddof=1) over the stratum's rows."""
+    mean = coef @ state.mean
+    cov = coef @ state.m2 @ coef.T / (state.K - 1) if state.K > 1 else np.zeros((2, 2))
+    return mean, cov
+
+
+def stratified_estimates(cols, strata, all_dirty=None):
+    """
+    {(estimator, agg): (estimate, variance of the estimate)} of a stratified sample.
+    COUNT and SUM add up the per-stratum estimates (variances / K_h); AVG = SUM / COUNT
+    with a delta-method variance. None for an estimator without matching rows.
+    """
+    ids = stratum_ids(cols, strata)
+    batch = estimator_state.batch_from_columns(cols)
+    states = []
+    for h, n_h in enumerate(strata["population"]):
+        rows = ids == h
+        states.append(estimator_state.EstimatorState.from_batch(
+            {name: values[rows] for name, values in batch.items()}, n_h
+        ))
+
+    results = {}
+    for estimator in ["rawsc", "normalizedsc"]:
+        if estimator == "normalizedsc" and all_dirty is None:
+            continue
+        total = np.zeros(2)
+        cov = np.zeros((2, 2))
+        for state in states:
+            if state.K == 0:
+                continue
+            n_h = state.n_population
+            # (count, sum) terms: φ_clean for RawSC, q = φ_dirty - φ_clean for NormalizedSC
+            coef = np.array([[n_h, 0.0, 0.0, 0.0], [0.0, n_h, 0.0, 0.0]])
+            if estimator == "normalizedsc":
+                coef = np.array([[0.0, 0.0, n_h, 0.0], [0.0, 0.0, 0.0, n_h]]) - coef
+            mean_h, cov_h = _totals(state, coef)
+            total += mean_h
+            cov += cov_h / state.K
+
+        if estimator == "rawsc":
+            if sum(s.K_pred_clean for s in states) == 0:
+                continue
+            count, sum_ = total
+        else:
+            if sum(s.K_pred_clean + s.K_pred_dirty for s in states) == 0:
+                continue
+            count, sum_ = all_dirty["count"] - total[0], all_dirty["sum"] - total[1]
+        avg = sum_ / count if count else 0.0
+        var_avg = (cov[1, 1] - 2 * avg * cov[0, 1] + avg * avg * cov[0, 0]) / (count * count) if count else 0.0
+        results[(estimator, "count")] = (count, cov[0, 0])
+        results[(estimator, "sum")] = (sum_, cov[1, 1])
+        results[(estimator, "avg")] = (avg, max(var_avg, 0.0))
+    return results
+
+
+def main():
+    strata = load_strata()
+    all_dirty = all_infos.true_values()["dirty"]
+
+    files = sorted(glob.glob(os.path.join(OUTPUT_DIR, f"{SAMPLE_PREFIX}*.tbl")))
+    if not files:
+        print("No sample files found in", OUTPUT_DIR)
+        return
+
+    results = {}
+    for file in files:
+        sample_size = int(os.path.basename(file).split("_")[-1].split(".")[0])
+        res = stratified_estimates(columnar_store.load_table(file), strata, all_dirty)
+        for (estimator, agg), (est, var) in res.items():
+            # variance per row, so that the plots' sqrt(variance / sample_size) is the standard error
+            results.setdefault((estimator, agg), []).append((sample_size, est, var * sample_size))
+        print(f"Processed {file} ({num_strata(strata)} strata) ✅")
+
+    for (estimator, agg), data in results.items():
+        csv_path = f"stratified_{estimator}_{agg}_results_ytd.csv"
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["sample_size", "mean", "variance"])
+            writer.writerows(sorted(data))
+        print(f"Saved results → {csv_path}")
+
+
+if __name__ == "__main__":
+    # python stratified.py draw: stratified samples from INPUT_FILE; without argument: estimates
+    if sys.argv[1:] == ["draw"]:
+        seed_seq = np.random.SeedSequence(SEED)
+        print(f"Seed: {seed_seq.entropy}")
+        write_samples(INPUT_FILE, SAMPLE_SIZES, np.random.default_rng(seed_seq))
+    else:
+        main()
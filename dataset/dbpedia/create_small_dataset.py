@@ -1,21 +1,95 @@
-from rdflib import Graph
+import random
 
 INPUT_FILE = "citations_lang=en_data.ttl"
 OUTPUT_FILE = "sample_citations.ttl"
+
+# Stop after MAX_TRIPLES triples or MAX_SUBJECTS subjects (None = no limit).
+# Limits are checked between subject blocks, so a subject is never cut in half.
 MAX_TRIPLES = 4000000
+MAX_SUBJECTS = None
+
+# None: copy the head of the file. Otherwise keep every subject independently
+# with this probability (a random subject-level sample of the whole file).
+SAMPLE_FRACTION = None
+SEED = None
+
+READ_BLOCK_BYTES = 1 << 22
+
+DIRECTIVES = (b"@prefix", b"@base", b"prefix", b"base")
+
+
+def iter_statements(path, block_bytes=READ_BLOCK_BYTES):
+    """
+    Stream a Turtle / N-Triples file statement by statement, without parsing it.
+    Yields (subject, text, n_triples) where text is the statement's raw bytes;
+    subject is None for @prefix / @base directives. A statement ends at the first
+    line ending in "." (one line in N-Triples, a ";"-continued block in Turtle);
+    n_triples counts its lines, which is exact for one triple per line.
+    """
+    lines = []
+    tail = b""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_bytes)
+            if not block:
+                break
+            parts = (tail + block).split(b"\n")
+            tail = parts.pop()
+            for line in parts:
+                stripped = line.strip()
+                if not lines:
+                    if not stripped or stripped.startswith(b"#"):
+                        continue
+                    if stripped.split(None, 1)[0].lower() in DIRECTIVES:
+                        yield None, line + b"\n", 0
+                        continue
+                lines.append(line)
+                if stripped.endswith(b"."):
+                    yield lines[0].split(None, 1)[0], b"\n".join(lines) + b"\n", len(lines)
+                    lines = []
+    if tail.strip():
+        lines.append(tail)
+    if lines:
+        yield lines[0].split(None, 1)[0], b"\n".join(lines) + b"\n", len(lines)
+
+
+def extract(input_file, output_file, max_triples=MAX_TRIPLES, max_subjects=MAX_SUBJECTS,
+            sample_fraction=SAMPLE_FRACTION, seed=SEED):
+    """Write the head (or a random subject sample) of input_file to output_file as it is read."""
+    rng = random.Random(seed)
+    n_triples = 0
+    n_subjects = 0
+    subject = None
+    keep = False
+
+    with open(output_file, "wb") as out:
+        for s, text, n in iter_statements(input_file):
+            # prefixes are always copied, in place, so later statements can use them
+            if s is None:
+                out.write(text)
+                continue
+
+            if s != subject:
+                if (max_triples is not None and n_triples >= max_triples) or \
+                        (max_subjects is not None and n_subjects >= max_subjects):
+                    break
+                subject = s
+                keep = sample_fraction is None or rng.random() < sample_fraction
+                if keep:
+                    n_subjects += 1
 
-g = Graph()
-print("Parsing large TTL file...")
-g.parse(INPUT_FILE, format="turtle")
+            if keep:
+                out.write(text)
+                n_triples += n
 
-print(f"Extracting first {MAX_TRIPLES} triples...")
-g_small = Graph()
+    return n_triples, n_subjects
 
-for i, triple in enumerate(g):
-    if i >= MAX_TRIPLES:
-        break
-    g_small.add(triple)
 
-print(f"Writing to {OUTPUT_FILE}...")
-g_small.serialize(destination=OUTPUT_FILE, format="turtle")
-print("Done.")
+if __name__ == "__main__":
+    if SAMPLE_FRACTION is None:
+        print(f"Copying the first {MAX_TRIPLES} triples of {INPUT_FILE}...")
+    else:
+        print(f"Sampling {SAMPLE_FRACTION:.2%} of the subjects of {INPUT_FILE}...")
+    n_triples, n_subjects = extract(INPUT_FILE, OUTPUT_FILE)
+    print(f"Wrote {n_triples} triples of {n_subjects} subjects to {OUTPUT_FILE}")
+    print("Done.")
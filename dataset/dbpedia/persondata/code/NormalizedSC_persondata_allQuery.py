@@ -1,19 +1,23 @@
 #!/usr/bin/env python3
-import subprocess
 import sys
-import json
 import csv
 import os
 import re
 from glob import glob
 from math import sqrt
+from string import Template
+import numpy as np
+from persondata_store import GraphDBStore, LocalStore
+import true_values_calculator
+import weighted_stats
 
 # ============================================
 # CONFIG
 # ============================================
 
+# Sample backend, as in RawSC_persondata_allQuery: "graphdb" or "local" (no triple store needed)
+BACKEND = "graphdb"
 REPO_URL = "http://localhost:7200/repositories/personaldata_subset"
-STATEMENTS_URL = REPO_URL + "/statements"
 SAMPLES_GLOB = "clean/persondata_sample_*.ttl"
 
 CSV_COUNT = "normsc_count_results.csv"
@@ -22,14 +26,17 @@ CSV_AVG   = "normsc_avg_results.csv"
 
 DIRTY_POP_SIZE_N = 1254428
 
-ALLDIRTY_COUNT = 735646
-ALLDIRTY_SUM   = 1667366188
-ALLDIRTY_AVG   = ALLDIRTY_SUM / ALLDIRTY_COUNT
-
 Z_VALUE = 1.96
 
 DELETE_QUERY = "DELETE WHERE { ?s ?p ?o }"
 
+# Compute the sums of q and q² inside GraphDB (AGGREGATE_QUERY) instead of fetching every tuple
+AGGREGATE_IN_SPARQL = False
+
+# Same named graphs as RawSC_persondata_allQuery: each sample is imported once and reused
+USE_NAMED_GRAPHS = True
+SAMPLE_GRAPH_PREFIX = "http://example.org/graph/persondata_sample_"
+
 # ============================================
 # SPARQL QUERIES
 # ============================================
@@ -73,38 +80,47 @@ WHERE {
 }
 """
 
+# Aggregate query (AGGREGATE_IN_SPARQL): q(t) = φ_dirty(t) - φ_clean(t) is computed
+# and summed inside the store. COUNT/SUM terms are weighted by m = numdirty (the
+# replication of the tuple loop), AVG terms are not.
+# $N = DIRTY_POP_SIZE_N, $C_DIRTY = K / Kp_dirty, $C_CLEAN = d * K / Kp_clean.
+AGGREGATE_QUERY = Template("""
+PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+PREFIX dbo: <http://dbpedia.org/ontology/>
+PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+PREFIX ex: <http://example.org/ontology/>
+
+SELECT
+  (COUNT(*) AS ?n) (SUM(?m) AS ?w)
+  (SUM(?m * ?q_count) AS ?s_count) (SUM(?m * ?q_count * ?q_count) AS ?ss_count)
+  (SUM(?m * ?q_sum)   AS ?s_sum)   (SUM(?m * ?q_sum * ?q_sum)     AS ?ss_sum)
+  (SUM(?q_avg)        AS ?s_avg)   (SUM(?q_avg * ?q_avg)          AS ?ss_avg)
+WHERE {
+  ?person a foaf:Person ;
+          ex:numdirty ?numdirty .
+  OPTIONAL { ?person dbo:birthDate ?cdate . }
+  OPTIONAL { ?person ex:birthDate_dirty ?ddate . }
+  BIND(xsd:double(?numdirty) AS ?nd)
+  BIND(FLOOR(?nd) AS ?m)
+  BIND(IF(BOUND(?cdate), 1.0, 0.0) AS ?pc)
+  BIND(IF(BOUND(?ddate), 1.0, 0.0) AS ?pd)
+  BIND(IF(BOUND(?cdate), xsd:double(YEAR(xsd:date(?cdate))), 0.0) AS ?yc)
+  BIND(IF(BOUND(?ddate), xsd:double(YEAR(xsd:date(?ddate))), 0.0) AS ?yd)
+  BIND(?pd * $N - ?pc * $N / ?nd AS ?q_count)
+  BIND(?pd * $N * ?yd - ?pc * $N * ?yc / ?nd AS ?q_sum)
+  BIND(?pd * $C_DIRTY * ?yd - ?pc * $C_CLEAN * ?yc / ?nd AS ?q_avg)
+}
+""")
+
 # ============================================
 # UTIL FUNCTIONS
 # ============================================
 
-def import_file(path):
-    subprocess.run([
-        "curl","-X","POST",
-        "-H","Content-Type: text/turtle",
-        "--data-binary", f"@{path}",
-        STATEMENTS_URL
-    ], check=True)
-
-def run_query(q):
-    p = subprocess.Popen(
-        ["curl","-X","POST",
-         "-H","Content-Type: application/sparql-query",
-         "-H","Accept: application/sparql-results+json",
-         "--data-binary","@-", REPO_URL],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        text=True
-    )
-    out,_ = p.communicate(q)
-    return json.loads(out)
-
-def delete_all():
-    subprocess.Popen(
-        ["curl","-X","POST","-H","Content-Type: application/sparql-update",
-         "--data-binary","@-", STATEMENTS_URL],
-        stdin=subprocess.PIPE,
-        text=True
-    ).communicate(DELETE_QUERY)
+def open_store():
+    if BACKEND == "local":
+        return LocalStore()
+    return GraphDBStore(REPO_URL, META_QUERY, TUPLES_QUERY,
+                        USE_NAMED_GRAPHS, SAMPLE_GRAPH_PREFIX, DELETE_QUERY)
 
 def extract_size(path):
     m = re.search(r"(\d+)\.ttl$", path)
@@ -116,6 +132,9 @@ def extract_size(path):
 
 def main():
 
+    # All Dirty values, cached by true_values_calculator for the current dirty full file
+    all_dirty = true_values_calculator.true_values()["dirty"]
+
     sample_files = sorted(glob(SAMPLES_GLOB), key=extract_size)
 
     fout_count = csv.writer(open(CSV_COUNT,"w"))
@@ -127,65 +146,74 @@ def main():
     fout_sum.writerow(["sample_size","normsc_sum","ci_sum"])
     fout_avg.writerow(["sample_size","normsc_avg","ci_avg"])
 
+    store = open_store()
+
     for fp in sample_files:
         size = extract_size(fp)
 
         print("\n=== SAMPLE", size, "===")
 
-        delete_all()
-        import_file(fp)
+        store.load(fp, size)
 
-        meta = run_query(META_QUERY)["results"]["bindings"][0]
-        K = float(meta["K"]["value"])
-        Kprime = float(meta["Kprime"]["value"])
-        Kp_clean = float(meta["Kp_clean"]["value"])
-        Kp_dirty = float(meta["Kp_dirty"]["value"])
+        meta = store.meta()
+        K = meta["K"]
+        Kprime = meta["Kprime"]
+        Kp_clean = meta["Kp_clean"]
+        Kp_dirty = meta["Kp_dirty"]
 
         d = K / Kprime
 
         print("K =", K, "K' =", Kprime, "Kp_clean =", Kp_clean, "Kp_dirty =", Kp_dirty)
 
-        res = run_query(TUPLES_QUERY)
-        rows = res["results"]["bindings"]
-
-        q_count = []
-        q_sum   = []
-        q_avg   = []
-
-        for r in rows:
-            nd = float(r["numdirty"]["value"])
-            m = int(nd)
-
-            pred_clean = float(r.get("pred_clean", {}).get("value", "0"))
-            pred_dirty = float(r.get("pred_dirty", {}).get("value", "0"))
-            yc = float(r.get("year_clean", {}).get("value", "0"))
-            yd = float(r.get("year_dirty", {}).get("value", "0"))
+        if AGGREGATE_IN_SPARQL and isinstance(store, GraphDBStore):
+            query = AGGREGATE_QUERY.substitute(
+                N=repr(float(DIRTY_POP_SIZE_N)),
+                C_DIRTY=repr(K / Kp_dirty if Kp_dirty > 0 else 0.0),
+                C_CLEAN=repr(d * K / Kp_clean if Kp_clean > 0 else 0.0),
+            )
+            agg = store.query(query)["results"]["bindings"][0]
+
+            def value(name):
+                return float(agg[name]["value"]) if name in agg else 0.0
+
+            n, w = value("n"), value("w")
+
+            # ---- MEAN / VARIANCE (from Σq and Σq², as over the replicated values) ----
+            mean_qc, var_qc = weighted_stats.mean_var_from_sums(w, value("s_count"), value("ss_count"))
+            mean_qs, var_qs = weighted_stats.mean_var_from_sums(w, value("s_sum"), value("ss_sum"))
+            mean_qa, var_qa = weighted_stats.mean_var_from_sums(n, value("s_avg"), value("ss_avg"))
+        else:
+            t = store.tuples()
+            nd = t["numdirty"]
+            m = nd.astype(int)
+
+            pred_clean = t["pred_clean"]
+            pred_dirty = t["pred_dirty"]
+            yc = t["year_clean"]
+            yd = t["year_dirty"]
 
             phi_d_count = pred_dirty * DIRTY_POP_SIZE_N
             phi_d_sum   = pred_dirty * DIRTY_POP_SIZE_N * yd
-            phi_d_avg   = pred_dirty * (K / Kp_dirty) * yd if Kp_dirty > 0 else 0.0
+            phi_d_avg   = pred_dirty * (K / Kp_dirty) * yd if Kp_dirty > 0 else np.zeros_like(nd)
 
             phi_c_count = pred_clean * (DIRTY_POP_SIZE_N / nd)
             phi_c_sum   = pred_clean * (DIRTY_POP_SIZE_N * yc / nd)
-            phi_c_avg   = pred_clean * (d * K / Kp_clean) * (yc / nd) if Kp_clean > 0 else 0.0
+            phi_c_avg   = pred_clean * (d * K / Kp_clean) * (yc / nd) if Kp_clean > 0 else np.zeros_like(nd)
 
             diff_count = phi_d_count - phi_c_count
             diff_sum   = phi_d_sum   - phi_c_sum
             diff_avg   = phi_d_avg   - phi_c_avg
 
-            q_count.extend([diff_count] * m)
-            q_sum.extend([diff_sum] * m)
-            q_avg.append(diff_avg)
-
-        # ---- MEAN ----
-        mean_qc = sum(q_count) / len(q_count)
-        mean_qs = sum(q_sum) / len(q_sum)
-        mean_qa = sum(q_avg) / len(q_avg)
+            # ---- MEAN / VARIANCE ----
+            # COUNT and SUM: every tuple stands for its m duplicates (weight m)
+            mean_qc, var_qc = weighted_stats.mean_var(diff_count, m)
+            mean_qs, var_qs = weighted_stats.mean_var(diff_sum, m)
+            mean_qa, var_qa = weighted_stats.mean_var(diff_avg)
 
         # ---- NORM RESULTS ----
-        norm_count = ALLDIRTY_COUNT - mean_qc
-        norm_sum   = ALLDIRTY_SUM   - mean_qs
-        norm_avg   = ALLDIRTY_AVG   - mean_qa
+        norm_count = all_dirty["count"] - mean_qc
+        norm_sum   = all_dirty["sum"]   - mean_qs
+        norm_avg   = all_dirty["avg"]   - mean_qa
 
         print("NormalizedSC COUNT =", norm_count)
         print("NormalizedSC SUM   =", norm_sum)
@@ -196,21 +224,16 @@ def main():
         # CI = Z * stddev(q) / sqrt(K)
         # -----------------------------------
 
-        def stddev(arr, mean):
-            return sqrt(sum((x-mean)**2 for x in arr) / (len(arr)-1)) if len(arr) > 1 else 0.0
-
-        std_qc = stddev(q_count, mean_qc)
-        std_qs = stddev(q_sum, mean_qs)
-        std_qa = stddev(q_avg, mean_qa)
-
-        ci_count = Z_VALUE * std_qc / sqrt(K)
-        ci_sum   = Z_VALUE * std_qs / sqrt(K)
-        ci_avg   = Z_VALUE * std_qa / sqrt(K)
+        ci_count = Z_VALUE * sqrt(var_qc) / sqrt(K)
+        ci_sum   = Z_VALUE * sqrt(var_qs) / sqrt(K)
+        ci_avg   = Z_VALUE * sqrt(var_qa) / sqrt(K)
 
         fout_count.writerow([size, norm_count, ci_count])
         fout_sum.writerow([size, norm_sum, ci_sum])
         fout_avg.writerow([size, norm_avg, ci_avg])
 
+    store.close()
+
 
 if __name__ == "__main__":
     main()
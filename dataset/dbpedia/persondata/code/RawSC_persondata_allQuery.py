@@ -1,17 +1,22 @@
 #!/usr/bin/env python3
-import subprocess
 import sys
-import json
 import csv
 import os
 import re
 from glob import glob
 from math import sqrt
+from string import Template
+import numpy as np
+from sparql_client import SparqlError
+from persondata_store import GraphDBStore, LocalStore
+import weighted_stats
 
 # ---------- CONFIG ----------
 
+# Sample backend: "graphdb" (SPARQL against REPO_URL) or "local"
+# (persondata_store.LocalStore reads the sample .ttl files, no triple store needed)
+BACKEND = "graphdb"
 REPO_URL = "http://localhost:7200/repositories/personaldata_subset"
-STATEMENTS_URL = REPO_URL + "/statements"
 
 SAMPLES_GLOB = "clean/persondata_sample_*.ttl"
 
@@ -27,6 +32,15 @@ DIRTY_POP_SIZE_N = 1021408
 
 DELETE_QUERY = "DELETE WHERE { ?s ?p ?o }"
 
+# Compute Σφ and Σφ² inside GraphDB (RAWSC_AGGREGATE_QUERY) instead of fetching every tuple
+AGGREGATE_IN_SPARQL = False
+
+# Load every sample once into its own named graph (SAMPLE_GRAPH_PREFIX + <N>_<path hash>) and scope
+# the queries to it, instead of clearing the whole repository and re-importing per sample.
+# Graphs stay in the repository, so later runs skip the import of unchanged samples.
+USE_NAMED_GRAPHS = True
+SAMPLE_GRAPH_PREFIX = "http://example.org/graph/persondata_sample_"
+
 # ---------- SPARQL QUERIES ----------
 
 # 1) Meta query: K, K', Kp
@@ -39,7 +53,7 @@ PREFIX ex: <http://example.org/ontology/>
 SELECT
   (COUNT(?person) AS ?K)
   (SUM(1.0 / xsd:double(?numdirty)) AS ?Kprime)
-  (SUM(IF(BOUND(?date), 1, 0)) AS ?Kp)
+  (SUM(IF(BOUND(?date), 1, 0)) AS ?Kp_clean)
 WHERE {
   ?person a foaf:Person ;
           ex:numdirty ?numdirty .
@@ -56,8 +70,8 @@ PREFIX ex: <http://example.org/ontology/>
 
 SELECT
   ?numdirty
-  (IF(BOUND(?date), 1, 0) AS ?pred)
-  (IF(BOUND(?date), YEAR(xsd:date(?date)), 0) AS ?year)
+  (IF(BOUND(?date), 1, 0) AS ?pred_clean)
+  (IF(BOUND(?date), YEAR(xsd:date(?date)), 0) AS ?year_clean)
 WHERE {
   ?person a foaf:Person ;
           ex:numdirty ?numdirty .
@@ -65,68 +79,43 @@ WHERE {
 }
 """
 
+# 3) Aggregate query (AGGREGATE_IN_SPARQL): the per-tuple φ_clean values of
+#    RAWSC_TUPLES_QUERY are computed and summed inside the store; only
+#    COUNT, SUM(φ) and SUM(φ²) per aggregate come back.
+#    $N = DIRTY_POP_SIZE_N, $C_AVG = d * K / Kp (from the meta query).
+RAWSC_AGGREGATE_QUERY = Template("""
+PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+PREFIX dbo: <http://dbpedia.org/ontology/>
+PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+PREFIX ex: <http://example.org/ontology/>
+
+SELECT
+  (COUNT(*) AS ?n)
+  (SUM(?phi_count) AS ?s_count) (SUM(?phi_count * ?phi_count) AS ?ss_count)
+  (SUM(?phi_sum)   AS ?s_sum)   (SUM(?phi_sum * ?phi_sum)     AS ?ss_sum)
+  (SUM(?phi_avg)   AS ?s_avg)   (SUM(?phi_avg * ?phi_avg)     AS ?ss_avg)
+WHERE {
+  ?person a foaf:Person ;
+          ex:numdirty ?numdirty .
+  OPTIONAL { ?person dbo:birthDate ?date . }
+  BIND(xsd:double(?numdirty) AS ?nd)
+  FILTER(?nd != 0)
+  BIND(IF(BOUND(?date), 1.0, 0.0) AS ?pred)
+  BIND(IF(BOUND(?date), xsd:double(YEAR(xsd:date(?date))), 0.0) AS ?year)
+  BIND(?pred * $N / ?nd AS ?phi_count)
+  BIND(?pred * $N * ?year / ?nd AS ?phi_sum)
+  BIND(?pred * $C_AVG * ?year / ?nd AS ?phi_avg)
+}
+""")
+
 # ---------- HELPER FUNCTIONS ----------
 
-def import_file(filepath: str):
-    print(f"Importing file {filepath}...")
-    result = subprocess.run(
-        [
-            "curl",
-            "-X", "POST",
-            "-H", "Content-Type: text/turtle",
-            "--data-binary", f"@{filepath}",
-            STATEMENTS_URL,
-        ],
-        capture_output=True,
-        text=True,
-    )
-    if result.returncode != 0:
-        print("Import failed:", result.stderr)
-        sys.exit(1)
-    print("Import OK")
-
-def run_query(query: str):
-    """Run a SPARQL query string and return JSON result."""
-    proc = subprocess.Popen(
-        [
-            "curl",
-            "-X", "POST",
-            "-H", "Content-Type: application/sparql-query",
-            "-H", "Accept: application/sparql-results+json",
-            "--data-binary", "@-",
-            REPO_URL,
-        ],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
-    out, err = proc.communicate(query)
-    if proc.returncode != 0:
-        print("Query failed:", err)
-        sys.exit(1)
-    return json.loads(out)
-
-def delete_all_data():
-    print("Clearing repository...")
-    proc = subprocess.Popen(
-        [
-            "curl",
-            "-X", "POST",
-            "-H", "Content-Type: application/sparql-update",
-            "--data-binary", "@-",
-            STATEMENTS_URL,
-        ],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
-    out, err = proc.communicate(DELETE_QUERY)
-    if proc.returncode != 0:
-        print("Delete query failed:", err)
-        sys.exit(1)
-    print("Repo cleared.")
+def open_store():
+    """The sample backend selected by BACKEND."""
+    if BACKEND == "local":
+        return LocalStore()
+    return GraphDBStore(REPO_URL, RAWSC_META_QUERY, RAWSC_TUPLES_QUERY,
+                        USE_NAMED_GRAPHS, SAMPLE_GRAPH_PREFIX, DELETE_QUERY)
 
 def extract_sample_size(path: str) -> int:
     """
@@ -139,18 +128,6 @@ def extract_sample_size(path: str) -> int:
         return int(m.group(1))
     return -1
 
-def mean_and_var(values):
-    """Return (mean, sample_variance) for a list of floats."""
-    n = len(values)
-    if n == 0:
-        return 0.0, 0.0
-    mu = sum(values) / n
-    if n > 1:
-        var = sum((x - mu) ** 2 for x in values) / (n - 1)
-    else:
-        var = 0.0
-    return mu, var
-
 def ci_from_mean_var(mu, var, K, N, z=Z_VALUE):
     """
     Compute CI = mu ± z * sqrt(var / K) * fpc,
@@ -197,6 +174,7 @@ def main():
     if not count_exists:
         count_writer.writerow(["sample_size", "mu_count", "ci_low", "ci_high"])
 
+    store = open_store()
     try:
         for filepath in sample_files:
             sample_size = extract_sample_size(filepath)
@@ -204,17 +182,15 @@ def main():
             print(f"=== SAMPLE {sample_size} ===")
             print("================================")
 
-            # 1. Clear repo and import this sample
-            delete_all_data()
-            import_file(filepath)
+            # 1. Load this sample into the backend
+            store.load(filepath, sample_size)
 
             # 2. META: get K, K', Kp
-            meta_res = run_query(RAWSC_META_QUERY)
-            b = meta_res["results"]["bindings"][0]
+            b = store.meta()
 
-            K      = float(b["K"]["value"])      if "K"      in b else 0.0
-            Kprime = float(b["Kprime"]["value"]) if "Kprime" in b else 0.0
-            Kp     = float(b["Kp"]["value"])     if "Kp"     in b else 0.0
+            K      = b.get("K", 0.0)
+            Kprime = b.get("Kprime", 0.0)
+            Kp     = b.get("Kp_clean", 0.0)
 
             if K == 0:
                 print("K = 0, skipping sample.")
@@ -230,51 +206,55 @@ def main():
             if Kp > 0:
                 print(f"d * K / Kp (for AVG φ): {d * K / Kp}")
 
-            # 3. PER-TUPLE: get numdirty, predicate, year
-            tuples_res = run_query(RAWSC_TUPLES_QUERY)
-            bindings = tuples_res["results"]["bindings"]
+            if AGGREGATE_IN_SPARQL and isinstance(store, GraphDBStore):
+                # 3. AGGREGATE: Σφ and Σφ² per aggregate, computed by the store
+                query = RAWSC_AGGREGATE_QUERY.substitute(
+                    N=repr(float(DIRTY_POP_SIZE_N)),
+                    C_AVG=repr(d * K / Kp if Kp > 0 else 0.0),
+                )
+                agg = store.query(query)["results"]["bindings"][0]
 
-            phi_count = []
-            phi_sum   = []
-            phi_avg   = []
+                def value(name):
+                    return float(agg[name]["value"]) if name in agg else 0.0
 
-            for row in bindings:
-                # numdirty must always exist
-                numdirty = float(row["numdirty"]["value"])
-                if numdirty == 0:
-                    continue
+                n_tuples = int(value("n"))
+                mu_count, var_count = weighted_stats.mean_var_from_sums(n_tuples, value("s_count"), value("ss_count"))
+                mu_sum,   var_sum   = weighted_stats.mean_var_from_sums(n_tuples, value("s_sum"),   value("ss_sum"))
+                mu_avg,   var_avg   = weighted_stats.mean_var_from_sums(n_tuples, value("s_avg"),   value("ss_avg"))
+            else:
+                # 3. PER-TUPLE: get numdirty, predicate, year as arrays
+                tuples = store.tuples()
 
-                # predicate 0/1 and year (0 if no date)
-                pred = float(row.get("pred", {}).get("value", 0.0))
-                year = float(row.get("year", {}).get("value", 0.0))
+                # numdirty must always exist; predicate 0/1 and year (0 if no date)
+                keep     = tuples["numdirty"] != 0
+                numdirty = tuples["numdirty"][keep]
+                pred     = tuples["pred_clean"][keep]
+                year     = tuples["year_clean"][keep]
 
                 # φ_clean for COUNT and SUM (RawSC, Table 1)
-                phi_c = pred * DIRTY_POP_SIZE_N / numdirty
-                phi_s = pred * DIRTY_POP_SIZE_N * year / numdirty
+                phi_count = pred * DIRTY_POP_SIZE_N / numdirty
+                phi_sum   = pred * DIRTY_POP_SIZE_N * year / numdirty
 
                 # φ_clean for AVG
                 if Kp > 0:
-                    phi_a = pred * (d * K / Kp) * year / numdirty
+                    phi_avg = pred * (d * K / Kp) * year / numdirty
                 else:
-                    phi_a = 0.0
+                    phi_avg = np.zeros_like(numdirty)
 
-                phi_count.append(phi_c)
-                phi_sum.append(phi_s)
-                phi_avg.append(phi_a)
+                # 4. Means and variances from φ_clean values
+                n_tuples = len(phi_count)
+                mu_count, var_count = weighted_stats.mean_var(phi_count)
+                mu_sum,   var_sum   = weighted_stats.mean_var(phi_sum)
+                mu_avg,   var_avg   = weighted_stats.mean_var(phi_avg)
 
             # Sanity check: should have one φ per sampled tuple
-            if len(phi_count) != int(K):
+            if n_tuples != int(K):
                 print(
-                    f"WARNING: K={K} but got {len(phi_count)} tuples "
-                    f"from RAWSC_TUPLES_QUERY"
+                    f"WARNING: K={K} but got {n_tuples} tuples "
+                    f"from the per-tuple query"
                 )
 
-            # 4. Compute means, variances, and CIs from φ_clean values
-
-            mu_count, var_count = mean_and_var(phi_count)
-            mu_sum,   var_sum   = mean_and_var(phi_sum)
-            mu_avg,   var_avg   = mean_and_var(phi_avg)
-
+            # 5. CIs from the means and variances
             ci_count_low, ci_count_high = ci_from_mean_var(
                 mu_count, var_count, K, DIRTY_POP_SIZE_N
             )
@@ -297,18 +277,20 @@ def main():
             print(f"  CI AVG      = [{ci_avg_low}, {ci_avg_high}]")
             print(f"  Var AVG     = {var_avg}")
 
-            # 5. Write to CSVs
+            # 6. Write to CSVs
             count_writer.writerow([sample_size, mu_count, ci_count_low, ci_count_high])
             sum_writer.writerow([sample_size,   mu_sum,   ci_sum_low,   ci_sum_high])
             avg_writer.writerow([sample_size,   mu_avg,   ci_avg_low,   ci_avg_high])
 
-        # Optionally clear repo at the end
-        delete_all_data()
+    except SparqlError as e:
+        print("GraphDB request failed:", e)
+        sys.exit(1)
 
     finally:
         avg_f.close()
         sum_f.close()
         count_f.close()
+        store.close()
 
 if __name__ == "__main__":
     main()
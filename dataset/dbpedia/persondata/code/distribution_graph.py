@@ -1,67 +1,36 @@
-import re
 import matplotlib.pyplot as plt
 import numpy as np
+import ntriples
 
 dirty_full_file = "persondata_dirty_full.ttl"
 
-# Patterns
-clean_date_pattern  = re.compile(r'<http://dbpedia.org/ontology/birthDate>\s*"(\d{4})')
-dirty_date_pattern  = re.compile(r'<http://example.org/ontology/birthDate_dirty>\s*"(\d{4})')
-numdirty_pattern     = re.compile(r'<http://example.org/ontology/numdirty>\s*"(\d+)"')
-
 
 def extract_years_from_dirty_full(ttl_path):
+    """Clean and dirty birth years of every subject with a clean birthDate, each repeated numdirty times."""
     clean_years = []
     dirty_years = []
 
-    current_subject = None
-    current_clean = None
-    current_dirty = None
-    current_numdirty = 1
-
-    with open(ttl_path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-
-            # Extract subject URI
-            subject = line.split(" ")[0]
-
-            # New subject block begins
-            if current_subject is None:
-                current_subject = subject
-
-            elif subject != current_subject:
-                # Save previous subject data
-                if current_clean is not None:
-                    clean_years.extend([current_clean] * current_numdirty)
-                    dirty_years.extend([current_dirty] * current_numdirty)
-
-                # Reset for new subject
-                current_subject = subject
-                current_clean = None
-                current_dirty = None
-                current_numdirty = 1
-
-            # Clean birthDate
-            m = clean_date_pattern.search(line)
-            if m:
-                current_clean = int(m.group(1))
-
-            # Dirty birthDate
-            m = dirty_date_pattern.search(line)
-            if m:
-                current_dirty = int(m.group(1))
-
-            # numdirty
-            m = numdirty_pattern.search(line)
-            if m:
-                current_numdirty = int(m.group(1))
-
-        # Save LAST subject
+    for _, block in ntriples.subject_blocks(ttl_path):
+        current_clean = None
+        current_dirty = None
+        current_numdirty = 1
+
+        for pid, obj, _ in block:
+            if pid == ntriples.P_BIRTH_DATE:
+                y = ntriples.year(obj)
+                if y is not None:
+                    current_clean = y
+            elif pid == ntriples.P_BIRTH_DATE_DIRTY:
+                y = ntriples.year(obj)
+                if y is not None:
+                    current_dirty = y
+            elif pid == ntriples.P_NUMDIRTY:
+                nd = ntriples.literal(obj)
+                if nd is not None and nd.isdigit():
+                    current_numdirty = int(nd)
+
         if current_clean is not None:
-            clean_years.extend([current_clean] * 1)
+            clean_years.extend([current_clean] * current_numdirty)
             dirty_years.extend([current_dirty] * current_numdirty)
 
     return clean_years, dirty_years
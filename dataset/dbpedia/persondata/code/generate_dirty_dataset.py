@@ -1,4 +1,9 @@
+import os
 import random
+import hashlib
+import shutil
+from multiprocessing import Pool
+import ntriples
 
 '''
 ======= DATASET GENERATION STATS =======
@@ -29,26 +34,26 @@ input_file = "persondata_en.ttl"
 TOTAL_ENTRIES = 1254428
 N_values = range(500, 10001, 500)
 
-sample_files_clean = {}
-sample_files_stats = {}
+DIRTY_FULL_FILE = "persondata_dirty_full.ttl"
 
-# NEW: full dirty output file
-dirty_full_file = open("persondata_dirty_full.ttl", "w", encoding="utf-8")
+# Reproducibility / parallelism
+SEED = None        # master seed; None draws a fresh one (printed so the run can be repeated)
+NUM_SHARDS = 1     # output is bit-identical for a given (SEED, NUM_SHARDS)
+NUM_WORKERS = os.cpu_count()
 
-# Create sample output files
-for N in N_values:
-    sample_files_clean[N] = open(f"clean/persondata_sample_{N}.ttl", "w", encoding="utf-8")
-    sample_files_stats[N] = open(f"stats/persondata_sample_{N}.txt", "w", encoding="utf-8")
+# Sample membership: "hash" takes one uniform per subject from a seeded hash of its IRI,
+# so the samples are nested (smaller N ⊂ larger N) and do not depend on NUM_SHARDS;
+# "rng" draws independently per N from the shard's RNG stream
+SAMPLING = "hash"
 
-# =============================
-# Global Statistics Counters
-# =============================
-total_subjects = 0
-subjects_with_birthdate = 0
-dirty_modified = 0
-dirty_same_as_clean = 0
-duplicate_subjects = 0
-total_triples_full_dirty = 0
+
+def output_paths():
+    """All files written by a run: the full dirty file, then clean/stats file per N."""
+    paths = {"dirty_full": DIRTY_FULL_FILE, "clean": {}, "stats": {}}
+    for N in N_values:
+        paths["clean"][N] = f"clean/persondata_sample_{N}.ttl"
+        paths["stats"][N] = f"stats/persondata_sample_{N}.txt"
+    return paths
 
 
 # ----------------------------------------------------
@@ -56,16 +61,13 @@ total_triples_full_dirty = 0
 # dirty_date = clean_date 70% of time
 # dirty_date = modified date 30% of time
 # ----------------------------------------------------
-def modify_birth_date(triple, trigger_prob=0.3, per_digit_prob=0.5):
+def modify_birth_date(obj, rng, trigger_prob=0.3, per_digit_prob=0.5):
 
-    if "birthDate" not in triple:
+    clean_date = ntriples.literal(obj)
+    if clean_date is None:
         return None, None
 
-    parts = triple.split('"')
-    if len(parts) < 2:
-        return None, None
-
-    clean_date = parts[1]
+    clean_date = clean_date.decode("utf-8")
     if len(clean_date) < 4:
         return clean_date, clean_date
 
@@ -73,7 +75,7 @@ def modify_birth_date(triple, trigger_prob=0.3, per_digit_prob=0.5):
     rest = clean_date[4:]
 
     # 70% of time → dirty = clean
-    if random.random() >= trigger_prob:
+    if rng.random() >= trigger_prob:
         return clean_date, clean_date
 
     # Modify the year (4 digits)
@@ -82,10 +84,10 @@ def modify_birth_date(triple, trigger_prob=0.3, per_digit_prob=0.5):
     i=0
     for d in year:
         if d.isdigit():
-            if i==0 and random.random() > per_digit_prob:
+            if i==0 and rng.random() > per_digit_prob:
                 new_year.append(d)
             else:
-                new_year.append(random.choice(OCR_CONFUSION[d]))
+                new_year.append(rng.choice(OCR_CONFUSION[d]))
                 changed = True
         else:
             new_year.append(d)
@@ -98,68 +100,77 @@ def modify_birth_date(triple, trigger_prob=0.3, per_digit_prob=0.5):
     return clean_date, dirty_date
 
 
+def subject_uniform(subject, seed):
+    """Uniform [0, 1) value of a subject IRI (bytes), fixed by (seed, subject) alone."""
+    h = hashlib.blake2b(subject, digest_size=8, key=str(seed).encode())
+    return (int.from_bytes(h.digest(), "little") >> 11) * 2.0 ** -53
+
+
 # ----------------------------------------------------
 # Process one subject
 # ----------------------------------------------------
-def process(triples):
-    global total_subjects, subjects_with_birthdate
-    global dirty_modified, dirty_same_as_clean
-    global duplicate_subjects, total_triples_full_dirty
-
-    subject = triples[0].split(" ")[0]
-    total_subjects += 1
+def process(subject, block, out, rng, stats, seed):
+    u = subject_uniform(subject, seed) if SAMPLING == "hash" else None
+    subject = subject.decode("utf-8")
+    triples = b"\n".join(line for _, _, line in block).decode("utf-8")
+    stats["total_subjects"] += 1
 
     # Determine sample membership
-    included_sets = []
-    for N in N_values:
-        if random.random() < (N / TOTAL_ENTRIES):
-            included_sets.append(N)
+    if u is not None:
+        included_sets = [N for N in N_values if u < N / TOTAL_ENTRIES]
+    else:
+        included_sets = []
+        for N in N_values:
+            if rng.random() < (N / TOTAL_ENTRIES):
+                included_sets.append(N)
 
     # Always determine clean/dirty birthDate if exists
     clean_birthdate = None
     dirty_birthdate = None
 
-    for t in triples:
-        c, d = modify_birth_date(t)
+    for pid, obj, _ in block:
+        if pid != ntriples.P_BIRTH_DATE:
+            continue
+        c, d = modify_birth_date(obj, rng)
         if c is not None:
             clean_birthdate = c
             dirty_birthdate = d
-            subjects_with_birthdate += 1
+            stats["subjects_with_birthdate"] += 1
 
             if c == d:
-                dirty_same_as_clean += 1
+                stats["dirty_same_as_clean"] += 1
             else:
-                dirty_modified += 1
+                stats["dirty_modified"] += 1
             break
 
     # Duplication probability
-    duplicate = (random.random() < 0.2)
+    duplicate = (rng.random() < 0.2)
     numdirty_val = 2 if duplicate else 1
 
     if duplicate:
-        duplicate_subjects += 1
+        stats["duplicate_subjects"] += 1
 
     # ------------------------------------------------
     # ALWAYS WRITE to full dirty file
     # ------------------------------------------------
     # 1. Clean triples
-    dirty_full_file.write("\n".join(triples) + "\n")
-    total_triples_full_dirty += len(triples)
+    out["dirty_full"].write(triples + "\n")
+    stats["total_triples_full_dirty"] += len(block)
 
     # 2. Dirty birthDate triple (if subject has birthday)
     if dirty_birthdate is not None:
-        dirty_full_file.write(
+        out["dirty_full"].write(
             f'{subject} <http://example.org/ontology/birthDate_dirty> '
             f'"{dirty_birthdate}"^^<http://www.w3.org/2001/XMLSchema#date> .\n'
         )
-        total_triples_full_dirty += 1
+        stats["total_triples_full_dirty"] += 1
 
     # 3. numdirty triple
-    dirty_full_file.write(
+    out["dirty_full"].write(
         f'{subject} <http://example.org/ontology/numdirty> '
         f'"{numdirty_val}"^^<http://www.w3.org/2001/XMLSchema#integer> .\n'
     )
-    total_triples_full_dirty += 1
+    stats["total_triples_full_dirty"] += 1
 
     # ------------------------------------------------
     # WRITE into each sample file
@@ -167,76 +178,149 @@ def process(triples):
     for N in included_sets:
 
         # Clean triples
-        sample_files_clean[N].write("\n".join(triples) + "\n")
+        out["clean"][N].write(triples + "\n")
 
         # Dirty birthDate triple
         if dirty_birthdate is not None:
-            sample_files_clean[N].write(
+            out["clean"][N].write(
                 f'{subject} <http://example.org/ontology/birthDate_dirty> '
                 f'"{dirty_birthdate}"^^<http://www.w3.org/2001/XMLSchema#date> .\n'
             )
 
         # numdirty triple
-        sample_files_clean[N].write(
+        out["clean"][N].write(
             f'{subject} <http://example.org/ontology/numdirty> '
             f'"{numdirty_val}"^^<http://www.w3.org/2001/XMLSchema#integer> .\n'
         )
 
         # Stats: clean|dirty
         if clean_birthdate is not None:
-            sample_files_stats[N].write(clean_birthdate + "|" + dirty_birthdate + "\n")
+            out["stats"][N].write(clean_birthdate + "|" + dirty_birthdate + "\n")
         else:
-            sample_files_stats[N].write("0|0\n")
+            out["stats"][N].write("0|0\n")
 
 
 # ----------------------------------------------------
 # Loader (iterate subject blocks)
 # ----------------------------------------------------
-def load_persons(filepath):
-    current_subject = None
-    bucket = []
-
-    with open(filepath, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-
-            subj = line.split(" ")[0]
-
-            if subj != current_subject:
-                if bucket:
-                    process(bucket)
-                bucket = [line]
-                current_subject = subj
-            else:
-                bucket.append(line)
+def load_persons(filepath, start, end, out, rng, stats, seed):
+    for subject, block in ntriples.subject_blocks(filepath, start, end):
+        process(subject, block, out, rng, stats, seed)
 
-    if bucket:
-        process(bucket)
+
+# ----------------------------------------------------
+# Sharding (split at subject-block boundaries)
+# ----------------------------------------------------
+def shard_bounds(path, num_shards):
+    """Split the file into num_shards byte ranges that never cut a subject block."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as f:
+        for k in range(1, num_shards):
+            pos = max(size * k // num_shards, bounds[-1])
+            if pos > 0:
+                # finish the line that contains byte pos - 1
+                f.seek(pos - 1)
+                f.readline()
+            # the subject block we landed in stays with the previous shard
+            block_subject = None
+            while True:
+                line_start = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if not line or line.startswith(b"#"):
+                    continue
+                subj = line.split(b" ")[0]
+                if block_subject is None:
+                    block_subject = subj
+                elif subj != block_subject:
+                    break
+            bounds.append(max(line_start, bounds[-1]))
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def process_shard(task):
+    """Generate one shard into its own part files with its own RNG stream."""
+    shard, start, end, seed = task
+    rng = random.Random(f"{seed}:{shard}")
+    stats = {
+        "total_subjects": 0,
+        "subjects_with_birthdate": 0,
+        "dirty_modified": 0,
+        "dirty_same_as_clean": 0,
+        "duplicate_subjects": 0,
+        "total_triples_full_dirty": 0,
+    }
+
+    paths = output_paths()
+    out = {
+        "dirty_full": open(f"{paths['dirty_full']}.part{shard}", "w", encoding="utf-8"),
+        "clean": {N: open(f"{p}.part{shard}", "w", encoding="utf-8") for N, p in paths["clean"].items()},
+        "stats": {N: open(f"{p}.part{shard}", "w", encoding="utf-8") for N, p in paths["stats"].items()},
+    }
+    try:
+        load_persons(input_file, start, end, out, rng, stats, seed)
+    finally:
+        out["dirty_full"].close()
+        for f in out["clean"].values():
+            f.close()
+        for f in out["stats"].values():
+            f.close()
+    return stats
+
+
+def merge_parts(dest, num_shards):
+    """Concatenate dest.part0 .. dest.part<num_shards-1> into dest, in shard order."""
+    parts = [f"{dest}.part{k}" for k in range(num_shards)]
+    if num_shards == 1:
+        os.replace(parts[0], dest)
+        return
+    with open(dest, "wb") as fout:
+        for part in parts:
+            with open(part, "rb") as fin:
+                shutil.copyfileobj(fin, fout)
+            os.remove(part)
 
 
 # ----------------------------------------------------
 # Main
 # ----------------------------------------------------
-if __name__ == "__main__":
+def main():
+    seed = SEED if SEED is not None else random.SystemRandom().randrange(2**63)
+    print(f"Master seed: {seed} ({NUM_SHARDS} shard(s))")
     print("Processing...")
-    load_persons(input_file)
 
-    for f in sample_files_clean.values():
-        f.close()
-    for f in sample_files_stats.values():
-        f.close()
-    dirty_full_file.close()
+    tasks = [
+        (shard, start, end, seed)
+        for shard, (start, end) in enumerate(shard_bounds(input_file, NUM_SHARDS))
+    ]
+    if NUM_SHARDS == 1:
+        results = [process_shard(tasks[0])]
+    else:
+        with Pool(min(NUM_WORKERS, NUM_SHARDS)) as pool:
+            results = pool.map(process_shard, tasks)
+
+    paths = output_paths()
+    merge_parts(paths["dirty_full"], NUM_SHARDS)
+    for p in list(paths["clean"].values()) + list(paths["stats"].values()):
+        merge_parts(p, NUM_SHARDS)
+
+    stats = {key: sum(r[key] for r in results) for key in results[0]}
 
     print("\n======= DATASET GENERATION STATS =======")
-    print(f"Total subjects processed:          {total_subjects}")
-    print(f"Subjects with birthDate:           {subjects_with_birthdate}")
-    print(f"Dirty birthDates modified:         {dirty_modified}")
-    print(f"Dirty birthDates left unchanged:   {dirty_same_as_clean}")
-    print(f"Subjects marked as duplicates:     {duplicate_subjects}")
-    print(f"Total triples in full dirty file:  {total_triples_full_dirty}")
+    print(f"Total subjects processed:          {stats['total_subjects']}")
+    print(f"Subjects with birthDate:           {stats['subjects_with_birthdate']}")
+    print(f"Dirty birthDates modified:         {stats['dirty_modified']}")
+    print(f"Dirty birthDates left unchanged:   {stats['dirty_same_as_clean']}")
+    print(f"Subjects marked as duplicates:     {stats['duplicate_subjects']}")
+    print(f"Total triples in full dirty file:  {stats['total_triples_full_dirty']}")
     print("========================================\n")
 
     print("Done.")
 
+
+if __name__ == "__main__":
+    main()
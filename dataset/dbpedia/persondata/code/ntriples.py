@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+# ============================================
+# Streaming reader for the line-based persondata .ttl files (N-Triples: one
+# "<s> <p> <o> ." per line). The file is read in large binary blocks and every
+# triple is handed out as (subject, predicate id, object) without decoding it:
+# subject and object stay bytes, the predicate IRI is interned to a small int.
+# ============================================
+
+READ_BLOCK_BYTES = 1 << 22   # bytes read from disk at a time
+
+RDF_TYPE = b"<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>"
+BIRTH_DATE = b"<http://dbpedia.org/ontology/birthDate>"
+BIRTH_DATE_DIRTY = b"<http://example.org/ontology/birthDate_dirty>"
+NUMDIRTY = b"<http://example.org/ontology/numdirty>"
+
+
+class PredicateTable:
+    """Interns predicate IRIs (bytes, with <>) to consecutive ints, in order of first appearance."""
+
+    def __init__(self, iris=()):
+        self.ids = {}
+        self.iris = []
+        for iri in iris:
+            self.intern(iri)
+
+    def intern(self, iri):
+        pid = self.ids.get(iri)
+        if pid is None:
+            pid = self.ids[iri] = len(self.iris)
+            self.iris.append(iri)
+        return pid
+
+    def iri(self, pid):
+        return self.iris[pid]
+
+
+# Shared table: the persondata predicates always get the same ids
+PREDICATES = PredicateTable([RDF_TYPE, BIRTH_DATE, BIRTH_DATE_DIRTY, NUMDIRTY])
+P_TYPE, P_BIRTH_DATE, P_BIRTH_DATE_DIRTY, P_NUMDIRTY = range(4)
+
+
+def iter_chunks(path, start=0, end=None, block_bytes=READ_BLOCK_BYTES):
+    """
+    Yield the lines of path that start in the byte range [start, end) as chunks of
+    about block_bytes holding whole lines only. start must be at the beginning of a line.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        pos = start
+        tail = b""
+        while end is None or pos < end:
+            n = block_bytes if end is None else min(block_bytes, end - pos)
+            block = f.read(n)
+            if not block:
+                break
+            pos += len(block)
+            if end is not None and pos >= end and not block.endswith(b"\n"):
+                block += f.readline()  # finish the line that starts before end
+            cut = block.rfind(b"\n") + 1
+            if cut:
+                yield tail + block[:cut]
+                tail = block[cut:]
+            else:
+                tail += block
+        if tail:
+            yield tail + b"\n"
+
+
+def triples(path, start=0, end=None, only=None, predicates=PREDICATES):
+    """
+    Yield (subject, predicate id, object) for every triple of path in [start, end).
+    With only (predicate IRIs) just those triples are produced, still in file order;
+    the other lines are skipped by a bytes.find scan without being split.
+    """
+    if only is not None:
+        yield from _selected_triples(path, start, end, only, predicates)
+        return
+    ids = predicates.ids
+    for chunk in iter_chunks(path, start, end):
+        for line in chunk.split(b"\n"):
+            parts = line.split(b" ", 2)
+            if len(parts) < 3 or parts[0].startswith(b"#"):
+                continue
+            s, p, o = parts
+            pid = ids.get(p)
+            if pid is None:
+                pid = predicates.intern(p)
+            # objects end in >, " or a language tag, so this only drops the final " ."
+            yield s, pid, o.rstrip(b" \t\r.")
+
+
+def _selected_triples(path, start, end, only, predicates):
+    keys = [(b" " + iri + b" ", predicates.intern(iri)) for iri in only]
+    for chunk in iter_chunks(path, start, end):
+        find = chunk.find
+        hits = []
+        for key, pid in keys:
+            i = find(key)
+            while i >= 0:
+                line_start = chunk.rfind(b"\n", 0, i) + 1
+                line_end = find(b"\n", i)
+                hits.append((line_start, i, pid, i + len(key), line_end))
+                i = find(key, line_end)
+        hits.sort()
+        for line_start, pred_start, pid, obj_start, line_end in hits:
+            s = chunk[line_start:pred_start]
+            # the key must be the predicate, not text inside an object
+            if s and b" " not in s and not s.startswith(b"#"):
+                yield s, pid, chunk[obj_start:line_end].rstrip(b" \t\r.")
+
+
+def subject_blocks(path, start=0, end=None, predicates=PREDICATES):
+    """
+    Yield (subject, [(predicate id, object, line), ...]) for every run of consecutive
+    lines with the same subject, as written by the persondata dumps.
+    """
+    ids = predicates.ids
+    subject = None
+    block = []
+    for chunk in iter_chunks(path, start, end):
+        for line in chunk.split(b"\n"):
+            line = line.strip()
+            parts = line.split(b" ", 2)
+            if len(parts) < 3 or parts[0].startswith(b"#"):
+                continue
+            s, p, o = parts
+            pid = ids.get(p)
+            if pid is None:
+                pid = predicates.intern(p)
+            if s != subject:
+                if block:
+                    yield subject, block
+                subject = s
+                block = []
+            block.append((pid, o.rstrip(b" \t\r."), line))
+    if block:
+        yield subject, block
+
+
+def literal(obj):
+    """Lexical form (bytes) of a literal object such as "1950-01-01"^^<...>, or None."""
+    if not obj.startswith(b'"'):
+        return None
+    close = obj.find(b'"', 1)
+    return obj[1:close] if close > 0 else obj[1:]
+
+
+def year(obj):
+    """Leading 4-digit year of a literal object, or None."""
+    if obj[:1] == b'"' and obj[1:5].isdigit():
+        return int(obj[1:5])
+    return None
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+import os
+import re
+import hashlib
+import numpy as np
+from sparql_client import SparqlClient, with_graph
+import ntriples
+
+# ============================================
+# Backends that serve one persondata sample at a time to the estimators.
+# Both answer the same two questions:
+#   meta()   -> {"K", "Kprime", "Kp_clean", "Kp_dirty"}
+#   tuples() -> {"numdirty", "pred_clean", "pred_dirty", "year_clean", "year_dirty"} arrays
+# GraphDBStore asks a GraphDB repository with the estimator's SPARQL queries;
+# LocalStore reads the sample .ttl itself and needs no triple store.
+# ============================================
+
+FOAF_PERSON = b"<http://xmlns.com/foaf/0.1/Person>"
+
+# Lexical xsd:date (as accepted by xsd:date(?d)); anything else has no YEAR() in SPARQL
+DATE_RE = re.compile(rb'^"(-?\d{4,})-\d{2}-\d{2}(?:Z|[+-]\d{2}:\d{2})?"')
+
+
+def graph_iri(prefix, filepath, sample_size):
+    """
+    Named graph of a sample file: its size plus a short hash of its absolute path, so
+    same-size samples of different runs sharing a repository never replace each other.
+    """
+    path_hash = hashlib.blake2b(os.path.abspath(filepath).encode(), digest_size=6).hexdigest()
+    return f"{prefix}{sample_size}_{path_hash}"
+
+
+class GraphDBStore:
+    """
+    Samples in a GraphDB repository: each one loaded into its own named graph
+    (use_named_graphs, see graph_iri) or into the repository after clearing it.
+    """
+
+    def __init__(self, repo_url, meta_query, tuples_query, use_named_graphs=True,
+                 graph_prefix="http://example.org/graph/persondata_sample_",
+                 delete_query="DELETE WHERE { ?s ?p ?o }"):
+        self.client = SparqlClient(repo_url)
+        self.meta_query = meta_query
+        self.tuples_query = tuples_query
+        self.use_named_graphs = use_named_graphs
+        self.graph_prefix = graph_prefix
+        self.delete_query = delete_query
+        self.graph = None
+
+    def load(self, filepath, sample_size):
+        if self.use_named_graphs:
+            self.graph = graph_iri(self.graph_prefix, filepath, sample_size)
+            loaded = self.client.load_graph(filepath, self.graph)
+            print(f"Imported {filepath} into <{self.graph}>" if loaded
+                  else f"<{self.graph}> already holds {filepath}")
+        else:
+            self.graph = None
+            self.client.update(self.delete_query)
+            self.client.import_file(filepath)
+            print(f"Imported {filepath}")
+
+    def query(self, query):
+        """Run a SELECT on the current sample and return the SPARQL JSON result."""
+        return self.client.query(with_graph(query, self.graph))
+
+    def meta(self):
+        b = self.query(self.meta_query)["results"]["bindings"][0]
+        return {name: float(v["value"]) for name, v in b.items()}
+
+    def tuples(self):
+        return self.client.query_arrays(with_graph(self.tuples_query, self.graph))
+
+    def close(self):
+        # named graphs are kept for the next run; a plain load is cleared again
+        if not self.use_named_graphs:
+            self.client.update(self.delete_query)
+        self.client.close()
+
+
+class LocalStore:
+    """
+    Samples parsed straight from their .ttl (N-Triples lines) into columnar arrays.
+    Only the fixed persondata schema is indexed: persons are the subjects with
+    rdf:type foaf:Person and ex:numdirty; each row pairs one dbo:birthDate and one
+    ex:birthDate_dirty (either may be missing), as the OPTIONAL patterns of the queries do.
+    """
+
+    def __init__(self):
+        self.columns = None
+
+    @staticmethod
+    def _year(obj):
+        m = DATE_RE.match(obj)
+        return int(m.group(1)) if m else None
+
+    def load(self, filepath, sample_size):
+        persons = set()
+        numdirty = {}
+        clean = {}
+        dirty = {}
+        wanted = [ntriples.RDF_TYPE, ntriples.NUMDIRTY, ntriples.BIRTH_DATE, ntriples.BIRTH_DATE_DIRTY]
+        for s, p, o in ntriples.triples(filepath, only=wanted):
+            if not s.startswith(b"<"):
+                continue
+            if p == ntriples.P_TYPE:
+                if o == FOAF_PERSON:
+                    persons.add(s)
+            elif p == ntriples.P_NUMDIRTY:
+                value = ntriples.literal(o)
+                if value is not None:
+                    try:
+                        numdirty[s] = float(value)
+                    except ValueError:
+                        pass
+            elif p == ntriples.P_BIRTH_DATE:
+                clean.setdefault(s, []).append(self._year(o))
+            elif p == ntriples.P_BIRTH_DATE_DIRTY:
+                dirty.setdefault(s, []).append(self._year(o))
+
+        rows = []
+        for s, nd in numdirty.items():
+            if s not in persons:
+                continue
+            for yc in clean.get(s, [False]):
+                for yd in dirty.get(s, [False]):
+                    rows.append((nd, yc is not False, yd is not False, yc or 0, yd or 0))
+
+        cols = np.array(rows, dtype=np.float64).reshape(-1, 5)
+        self.columns = {
+            "numdirty": cols[:, 0],
+            "pred_clean": cols[:, 1],
+            "pred_dirty": cols[:, 2],
+            "year_clean": cols[:, 3],
+            "year_dirty": cols[:, 4],
+        }
+        print(f"Loaded {filepath} ({len(rows)} rows)")
+
+    def meta(self):
+        c = self.columns
+        return {
+            "K": float(len(c["numdirty"])),
+            "Kprime": float(np.sum(1.0 / c["numdirty"])),
+            "Kp_clean": float(np.sum(c["pred_clean"])),
+            "Kp_dirty": float(np.sum(c["pred_dirty"])),
+        }
+
+    def tuples(self):
+        return self.columns
+
+    def close(self):
+        self.columns = None
@@ -1,24 +1,19 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+import true_values_calculator
 
 # ----------------------------
 # CONFIG
 # ----------------------------
 ALL_RESULTS = {
     "count": {
-        "ALL_CLEAN": 613207,
-        "ALL_DIRTY": 736110,
         "Y_LABEL": "COUNT"
     },
     "sum": {
-        "ALL_CLEAN": 1182229731,
-        "ALL_DIRTY": 1670534580,
         "Y_LABEL": "SUM"
     },
     "avg": {
-        "ALL_CLEAN": 1927.9455893360644,
-        "ALL_DIRTY": 2269.4088926926684,
         "Y_LABEL": "AVG (Birth Year)"
     }
 }
@@ -123,6 +118,7 @@ def plot_best_estimator(agg_name):
 
 
 def main():
+    true_values_calculator.fill_results(ALL_RESULTS)
     for agg in ["avg", "count", "sum"]:
         plot_best_estimator(agg)
 
@@ -1,23 +1,18 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+import true_values_calculator
 
 
 # === CONFIGURATION ===
 ALL_RESULTS = {
     "count": {
-        "ALL_CLEAN": 613207,
-        "ALL_DIRTY": 736110,
         "LABEL": "COUNT"
     },
     "sum": {
-        "ALL_CLEAN": 1182229731,
-        "ALL_DIRTY": 1670534580,
         "LABEL": "SUM"
     },
     "avg": {
-        "ALL_CLEAN": 1927.9455893360644,
-        "ALL_DIRTY": 2269.4088926926684,
         "LABEL": "AVG (Birth Year)"
     }
 }
@@ -92,6 +87,7 @@ def plot_ci_percentage_error(agg_name):
 
 
 def main():
+    true_values_calculator.fill_results(ALL_RESULTS)
     for agg in ["avg", "count", "sum"]:
         plot_ci_percentage_error(agg)
 
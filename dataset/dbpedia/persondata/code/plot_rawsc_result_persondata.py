@@ -2,22 +2,17 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+import true_values_calculator
 
 # === TRUE VALUES FOR PERSONDATA ===
 TRUE_VALUES = {
     "count": {
-        "ALL_CLEAN": 613207,
-        "ALL_DIRTY": 736110,
         "Y_LABEL": "COUNT"
     },
     "sum": {
-        "ALL_CLEAN": 1182229731,
-        "ALL_DIRTY": 1670534580,
         "Y_LABEL": "SUM"
     },
     "avg": {
-        "ALL_CLEAN": 1927.9455893360644,
-        "ALL_DIRTY": 2269.4088926926684,
         "Y_LABEL": "AVG (Birth Year)"
     }
 }
@@ -76,6 +71,7 @@ def plot_rawsc_result(agg_name):
 
 
 def main():
+    true_values_calculator.fill_results(TRUE_VALUES)
     for agg in ["count", "sum", "avg"]:
         try:
             plot_rawsc_result(agg)
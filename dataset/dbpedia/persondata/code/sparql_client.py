@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import threading
+import http.client
+from urllib.parse import urlsplit, quote
+import numpy as np
+import pandas as pd
+
+# ============================================
+# In-process SPARQL client for a GraphDB (RDF4J) repository.
+# Requests go over a small pool of keep-alive HTTP/1.1 connections instead of
+# one curl process (and one TCP handshake) per call.
+# ============================================
+
+DEFAULT_TIMEOUT = 300      # seconds per request (imports of large samples are slow)
+DEFAULT_RETRIES = 3        # extra attempts on connection errors and 5xx answers
+DEFAULT_BACKOFF = 0.5      # seconds, doubled after every failed attempt
+DEFAULT_POOL_SIZE = 4      # idle connections kept open
+
+JSON_RESULTS = "application/sparql-results+json"
+CSV_RESULTS = "text/csv"
+
+RESULT_CHUNK_ROWS = 100000  # result rows parsed at a time by query_arrays
+
+# Marker triple <graph> LOADED_FROM "<file>|<size>|<mtime_ns>" left in every graph filled by load_graph
+LOADED_FROM = "http://example.org/ontology/loadedFrom"
+
+
+def with_graph(query, graph):
+    """Scope a SELECT/ASK query to one named graph by adding FROM <graph> before its WHERE clause."""
+    if graph is None:
+        return query
+    head, sep, tail = query.partition("WHERE {")
+    if not sep:
+        raise ValueError("Query has no 'WHERE {' clause to scope")
+    return f"{head}FROM <{graph}>\n{sep}{tail}"
+
+
+def _file_signature(filepath):
+    st = os.stat(filepath)
+    return f"{os.path.basename(filepath)}|{st.st_size}|{st.st_mtime_ns}"
+
+
+class SparqlError(RuntimeError):
+    """A SPARQL request failed for good (after retries, or with a 4xx answer)."""
+
+    def __init__(self, message, status=None, body=""):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+class SparqlClient:
+    """
+    Query, update and import against one repository URL
+    (e.g. http://localhost:7200/repositories/<repo>).
+    """
+
+    def __init__(self, repo_url, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, pool_size=DEFAULT_POOL_SIZE):
+        parts = urlsplit(repo_url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported repository URL: {repo_url}")
+        self.repo_url = repo_url
+        self._scheme = parts.scheme
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = parts.path.rstrip("/") or "/"
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    # ---------- connection pool ----------
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        cls = http.client.HTTPSConnection if self._scheme == "https" else http.client.HTTPConnection
+        return cls(self._host, self._port, timeout=self.timeout)
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- requests ----------
+
+    def _request(self, path, body, headers, consume=None):
+        """
+        POST body to path and return the response body (bytes), or consume(response) for a
+        successful response if given. body is bytes or a callable returning a fresh file
+        object, so it can be resent on retry.
+        """
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            conn = self._acquire()
+            data = body() if callable(body) else body
+            try:
+                conn.request("POST", path, body=data, headers=headers)
+                resp = conn.getresponse()
+                if consume is not None and resp.status < 300:
+                    result = consume(resp)
+                    resp.read()  # drain whatever consume() left, so the connection can be reused
+                else:
+                    payload = resp.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                error = SparqlError(f"POST {path} failed: {e}")
+            except BaseException:
+                # consume() raised, or an interrupt: the response may be half read, so the
+                # connection cannot go back to the pool
+                conn.close()
+                raise
+            else:
+                if resp.will_close:
+                    conn.close()
+                else:
+                    self._release(conn)
+                if resp.status < 300:
+                    return result if consume is not None else payload
+                text = payload.decode("utf-8", errors="replace")
+                error = SparqlError(f"POST {path} answered {resp.status} {resp.reason}: {text}",
+                                    status=resp.status, body=text)
+                if resp.status < 500:
+                    raise error
+            finally:
+                if hasattr(data, "close"):
+                    data.close()
+            if attempt < self.retries:
+                time.sleep(delay)
+                delay *= 2
+        raise error
+
+    def query_raw(self, query, accept=JSON_RESULTS):
+        """Run a SPARQL query and return the undecoded result document."""
+        return self._request(self._path, query.encode("utf-8"), {
+            "Content-Type": "application/sparql-query",
+            "Accept": accept,
+        })
+
+    def query(self, query):
+        """Run a SPARQL query and return the SPARQL JSON result."""
+        return json.loads(self.query_raw(query, JSON_RESULTS))
+
+    def query_arrays(self, query, fill=0.0, chunksize=RESULT_CHUNK_ROWS):
+        """
+        Run a SELECT query and return its columns as float64 NumPy arrays ({variable: array}).
+        The CSV result is parsed straight off the socket, chunksize rows at a time, so no
+        per-binding objects are built; unbound values become fill.
+        """
+        def consume(resp):
+            parts = {}
+            for df in pd.read_csv(resp, chunksize=chunksize, dtype=np.float64):
+                for name in df.columns:
+                    parts.setdefault(name, []).append(df[name].fillna(fill).to_numpy())
+            return {
+                name: np.concatenate(chunks) if chunks else np.empty(0)
+                for name, chunks in parts.items()
+            }
+
+        return self._request(self._path, query.encode("utf-8"), {
+            "Content-Type": "application/sparql-query",
+            "Accept": CSV_RESULTS,
+        }, consume)
+
+    def ask(self, query):
+        """Run a SPARQL ASK query and return its boolean."""
+        return bool(self.query(query)["boolean"])
+
+    def update(self, update):
+        """Run a SPARQL update (INSERT / DELETE / CLEAR ...)."""
+        self._request(self._path + "/statements", update.encode("utf-8"), {
+            "Content-Type": "application/sparql-update",
+        })
+
+    def import_file(self, filepath, content_type="text/turtle", graph=None):
+        """Stream an RDF file into the repository (into the named graph, if given)."""
+        path = self._path + "/statements"
+        if graph is not None:
+            path += "?context=" + quote(f"<{graph}>", safe="")
+        self._request(path, lambda: open(filepath, "rb"), {
+            "Content-Type": content_type,
+            "Content-Length": str(os.path.getsize(filepath)),
+        })
+
+    def load_graph(self, filepath, graph, content_type="text/turtle"):
+        """
+        Make the named graph hold exactly filepath. Returns False without touching the store
+        when the graph was already loaded from the same file (same name, size and mtime),
+        otherwise clears the graph, imports the file and returns True.
+        """
+        signature = _file_signature(filepath).replace("\\", "\\\\").replace('"', '\\"')
+        marker = f'<{graph}> <{LOADED_FROM}> "{signature}"'
+        if self.ask(f"ASK {{ GRAPH <{graph}> {{ {marker} }} }}"):
+            return False
+        self.update(f"CLEAR SILENT GRAPH <{graph}>")
+        self.import_file(filepath, content_type, graph)
+        self.update(f"INSERT DATA {{ GRAPH <{graph}> {{ {marker} }} }}")
+        return True
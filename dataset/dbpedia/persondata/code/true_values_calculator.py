@@ -1,130 +1,188 @@
 #!/usr/bin/env python3
-import re
+import hashlib
+from array import array
+import numpy as np
+import ground_truth
+import ntriples
 
 DIRTY_FILE = "persondata_dirty_full.ttl"
 
-print("Reading dirty full dataset...")
-
-# Regex to extract subject and year safely
-SUBJ_RE = re.compile(r"^<([^>]+)>")
-YEAR_RE = re.compile(r'"(\d{4})')  # only extract the first 4-digit year
-
-# Storage for all subjects
-birth_clean = {}      # subject → clean birth year (int)
-birth_dirty = {}      # subject → dirty birth year (int)
-numdup = {}           # subject → numdirty (int)
-
-with open(DIRTY_FILE, "r", encoding="utf-8") as f:
-    for line in f:
-        line = line.strip()
-        if not line or not line.startswith("<"):
-            continue
-
-        m = SUBJ_RE.match(line)
-        if not m:
+# Predicate of every persondata query: the person has a (clean / dirty) birth year
+PREDICATE = {"birth_year": "bound"}
+
+MISSING = -(2 ** 31)  # int32 marker for "no value" in the subject arrays
+
+
+def read_subjects(path):
+    """
+    One pass over a dirty full .ttl file into three int32 arrays indexed by a dense
+    subject ID: clean year, dirty year and numdirty (MISSING where absent).
+    The generator writes all triples of a subject together, so the ID is looked up once
+    per subject block, in a map keyed by an 8-byte digest of the subject URI (the URIs
+    themselves are not kept). A subject that shows up again later is merged into its ID.
+    """
+    clean = array("i")
+    dirty = array("i")
+    numdup = array("i")
+
+    ids = {}  # blake2b digest of subject → ID
+    prev = None
+    cur = -1
+    wanted = [ntriples.NUMDIRTY, ntriples.BIRTH_DATE, ntriples.BIRTH_DATE_DIRTY]
+    for subj, pid, obj in ntriples.triples(path, only=wanted):
+        if not subj.startswith(b"<"):
             continue
 
-        subj = m.group(1)
+        # next subject block → its ID (a new one for an unseen subject)
+        if subj != prev:
+            prev = subj
+            cur = ids.setdefault(hashlib.blake2b(subj, digest_size=8).digest(), len(clean))
+            if cur == len(clean):
+                clean.append(MISSING)
+                dirty.append(MISSING)
+                numdup.append(MISSING)
 
         # ------------ numdirty ------------
-        if "numdirty" in line:
-            n = YEAR_RE.search(line)
+        if pid == ntriples.P_NUMDIRTY:
             try:
-                numdir = int(line.split('"')[1])
-                numdup[subj] = numdir
-                
-            except:
-                numdup[subj] = 1
+                numdup[cur] = int(ntriples.literal(obj))
+            except (TypeError, ValueError):
+                numdup[cur] = 1
 
         # ------------ clean birthDate ------------
-        elif "dbpedia.org/ontology/birthDate" in line and "birthDate_dirty" not in line:
-            y = YEAR_RE.search(line)
-            if y:
-                birth_clean[subj] = int(y.group(1))
+        elif pid == ntriples.P_BIRTH_DATE:
+            y = ntriples.year(obj)
+            if y is not None:
+                clean[cur] = y
 
         # ------------ dirty birthDate ------------
-        elif "example.org/ontology/birthDate_dirty" in line:
-            y = YEAR_RE.search(line)
-            if y:
-                birth_dirty[subj] = int(y.group(1))
+        elif pid == ntriples.P_BIRTH_DATE_DIRTY:
+            y = ntriples.year(obj)
+            if y is not None:
+                dirty[cur] = y
+
+    return (
+        np.frombuffer(clean, dtype=np.int32),
+        np.frombuffer(dirty, dtype=np.int32),
+        np.frombuffer(numdup, dtype=np.int32),
+    )
+
+
+def compute_true_values(path):
+    """
+    Scan a dirty full .ttl file and print subject- and population-level COUNT/SUM/AVG
+    of the clean and dirty birth years. Returns the population-level values.
+    """
+    print("Reading dirty full dataset...")
+
+    birth_clean, birth_dirty, numdup = read_subjects(path)
+
+    print("Finished reading. Computing statistics...\n")
+
+    has_clean = birth_clean != MISSING
+    has_dirty = birth_dirty != MISSING
+
+    # Subjects with a birth year or a numdirty; numdup defaults to 1
+    known = has_clean | has_dirty | (numdup != MISSING)
+    nd = np.where(numdup == MISSING, 1, numdup).astype(np.int64)
+    n_subjects = int(np.count_nonzero(known))
+
+    # --------------------------
+    # SUBJECT-LEVEL STATISTICS
+    # --------------------------
+
+    clean_years = birth_clean[has_clean].astype(np.int64)
+    dirty_years = birth_dirty[has_dirty].astype(np.int64)
+
+    count_clean_subject = len(clean_years)
+    count_dirty_subject = len(dirty_years)
+
+    sum_clean_subject = int(clean_years.sum())
+    sum_dirty_subject = int(dirty_years.sum())
 
-print("Finished reading. Computing statistics...\n")
+    avg_clean_subject = sum_clean_subject / count_clean_subject if count_clean_subject else 0
+    avg_dirty_subject = sum_dirty_subject / count_dirty_subject if count_dirty_subject else 0
 
-# Ensure all subjects have a numdup (default = 1)
-for s in set(list(birth_clean.keys()) + list(birth_dirty.keys())):
-    if s not in numdup:
-        numdup[s] = 1
 
-# --------------------------
-# SUBJECT-LEVEL STATISTICS
-# --------------------------
+    # -------------------------------
+    # POPULATION-LEVEL STATISTICS
+    # Each subject counts numdup times
+    # -------------------------------
 
-clean_years = [birth_clean[s] for s in birth_clean]
-dirty_years = [birth_dirty[s] for s in birth_dirty]
+    count_clean_pop = int(nd[has_clean].sum())
+    sum_clean_pop = int(np.dot(clean_years, nd[has_clean]))
 
-count_clean_subject = len(clean_years)
-count_dirty_subject = len(dirty_years)
+    count_dirty_pop = int(nd[has_dirty].sum())
+    sum_dirty_pop = int(np.dot(dirty_years, nd[has_dirty]))
 
-sum_clean_subject = sum(clean_years)
-sum_dirty_subject = sum(dirty_years)
+    avg_clean_pop = sum_clean_pop / count_clean_pop if count_clean_pop else 0
+    avg_dirty_pop = sum_dirty_pop / count_dirty_pop if count_dirty_pop else 0
 
-avg_clean_subject = sum_clean_subject / count_clean_subject if count_clean_subject else 0
-avg_dirty_subject = sum_dirty_subject / count_dirty_subject if count_dirty_subject else 0
 
+    # -------------------------------
+    # REPORT
+    # -------------------------------
+    print("====================== FINAL RESULTS ======================")
 
-# -------------------------------
-# POPULATION-LEVEL STATISTICS
-# Each subject counts numdup[s] times
-# -------------------------------
+    print(f"Total subjects:           {int(nd[known].sum())}\n")
 
-count_clean_pop = 0
-sum_clean_pop = 0
+    print("---- SUBJECT-LEVEL CLEAN ----")
+    print(f"COUNT_clean_subject = {count_clean_subject}")
+    print(f"SUM_clean_subject   = {sum_clean_subject}")
+    print(f"AVG_clean_subject   = {avg_clean_subject}\n")
 
-count_dirty_pop = 0
-sum_dirty_pop = 0
+    print("---- SUBJECT-LEVEL DIRTY ----")
+    print(f"COUNT_dirty_subject = {count_dirty_subject}")
+    print(f"SUM_dirty_subject   = {sum_dirty_subject}")
+    print(f"AVG_dirty_subject   = {avg_dirty_subject}\n")
 
-for s, year in birth_clean.items():
-    nd = numdup.get(s, 1)
-    count_clean_pop += nd
-    sum_clean_pop += year * nd
+    print("---- POPULATION-LEVEL CLEAN ----")
+    print(f"COUNT_clean_population = {count_clean_pop}")
+    print(f"SUM_clean_population   = {sum_clean_pop}")
+    print(f"AVG_clean_population   = {avg_clean_pop}\n")
 
-for s, year in birth_dirty.items():
-    nd = numdup.get(s, 1)
-    count_dirty_pop += nd
-    sum_dirty_pop += year * nd
+    print("---- POPULATION-LEVEL DIRTY ----")
+    print(f"COUNT_dirty_population = {count_dirty_pop}")
+    print(f"SUM_dirty_population   = {sum_dirty_pop}")
+    print(f"AVG_dirty_population   = {avg_dirty_pop}\n")
 
-avg_clean_pop = sum_clean_pop / count_clean_pop if count_clean_pop else 0
-avg_dirty_pop = sum_dirty_pop / count_dirty_pop if count_dirty_pop else 0
+    print("---- MISSING ----")
+    print(f"Missing clean birthdates: {n_subjects - count_clean_subject}")
+    print(f"Missing dirty birthdates: {n_subjects - count_dirty_subject}")
 
+    return {
+        "clean": {"count": count_clean_pop, "sum": sum_clean_pop, "avg": avg_clean_pop},
+        "dirty": {"count": count_dirty_pop, "sum": sum_dirty_pop, "avg": avg_dirty_pop},
+    }
 
-# -------------------------------
-# REPORT
-# -------------------------------
-print("====================== FINAL RESULTS ======================")
 
-print(f"Total subjects:           {sum(numdup.values())}\n")
+def true_values(path=DIRTY_FILE, refresh=False):
+    """Population-level ALL CLEAN / ALL DIRTY values of path, from its ground-truth sidecar (computed on a miss)."""
+    return ground_truth.get(path, PREDICATE, compute_true_values, refresh=refresh)
 
-print("---- SUBJECT-LEVEL CLEAN ----")
-print(f"COUNT_clean_subject = {count_clean_subject}")
-print(f"SUM_clean_subject   = {sum_clean_subject}")
-print(f"AVG_clean_subject   = {avg_clean_subject}\n")
 
-print("---- SUBJECT-LEVEL DIRTY ----")
-print(f"COUNT_dirty_subject = {count_dirty_subject}")
-print(f"SUM_dirty_subject   = {sum_dirty_subject}")
-print(f"AVG_dirty_subject   = {avg_dirty_subject}\n")
+def stored_true_values(path=DIRTY_FILE):
+    """
+    ALL CLEAN / ALL DIRTY of path as stored in its ground-truth sidecar, never computed here
+    (for the plot scripts, which otherwise only need the result CSVs).
+    """
+    try:
+        return ground_truth.get(path, PREDICATE)
+    except (KeyError, FileNotFoundError) as e:
+        raise RuntimeError(
+            f"No ground truth stored for {path} ({e}). Run `python true_values_calculator.py` next to the dirty "
+            f"file first; it writes {ground_truth.sidecar_path(path)}."
+        ) from None
 
-print("---- POPULATION-LEVEL CLEAN ----")
-print(f"COUNT_clean_population = {count_clean_pop}")
-print(f"SUM_clean_population   = {sum_clean_pop}")
-print(f"AVG_clean_population   = {avg_clean_pop}\n")
 
-print("---- POPULATION-LEVEL DIRTY ----")
-print(f"COUNT_dirty_population = {count_dirty_pop}")
-print(f"SUM_dirty_population   = {sum_dirty_pop}")
-print(f"AVG_dirty_population   = {avg_dirty_pop}\n")
+def fill_results(results, path=DIRTY_FILE):
+    """Add the stored ALL_CLEAN / ALL_DIRTY of path to each aggregate entry of a plot's results dict."""
+    truth = stored_true_values(path)
+    for agg, entry in results.items():
+        entry.update(ALL_CLEAN=truth["clean"][agg], ALL_DIRTY=truth["dirty"][agg])
+    return results
 
-print("---- MISSING ----")
-print(f"Missing clean birthdates: {len(numdup) - count_clean_subject}")
-print(f"Missing dirty birthdates: {len(numdup) - count_dirty_subject}")
 
+if __name__ == "__main__":
+    true_values(DIRTY_FILE, refresh=True)
+    print(f"Saved ground truth → {ground_truth.sidecar_path(DIRTY_FILE)}")
@@ -0,0 +1,45 @@
+import numpy as np
+
+# === Weighted statistics kernel ===
+# Mean and variance of values that stand for several identical tuples (value i counted
+# weights[i] times, e.g. its numdirty duplicates), computed without materializing the
+# repeated values. The results equal np.mean / np.var(ddof=...) of np.repeat(values, weights).
+
+
+def mean_var(values, weights=None, ddof=1):
+    """
+    (mean, variance) of values with integer frequency weights (None = all 1).
+    Returns (0.0, 0.0) for no data and variance 0.0 when the total weight is <= ddof.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if weights is None:
+        n = len(values)
+        if n == 0:
+            return 0.0, 0.0
+        mean = float(np.mean(values))
+        var = float(np.var(values, ddof=ddof)) if n > ddof else 0.0
+        return mean, var
+
+    weights = np.asarray(weights, dtype=np.float64)
+    n = float(np.sum(weights))
+    if n == 0:
+        return 0.0, 0.0
+    mean = float(np.dot(weights, values) / n)
+    if n <= ddof:
+        return mean, 0.0
+    dev = values - mean
+    return mean, float(np.dot(weights, dev * dev) / (n - ddof))
+
+
+def mean_var_from_sums(n, s, ss, ddof=1):
+    """
+    (mean, variance) from a count n, a sum s and a sum of squares ss, e.g. aggregated
+    by a database. Uses the one-pass formula, so it is only accurate when the variance
+    is not tiny next to the squared mean.
+    """
+    if n == 0:
+        return 0.0, 0.0
+    mean = s / n
+    if n <= ddof:
+        return mean, 0.0
+    return mean, max(ss - s * mean, 0.0) / (n - ddof)